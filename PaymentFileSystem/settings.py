@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from celery.schedules import crontab
+from kombu import Queue
 import environ, os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -128,6 +130,70 @@ STORE_ID = env('STORE_ID')
 SIGNATURE_KEY = env('SIGNATURE_KEY')
 URL = env('URL')
 
+# aamarPay client: timeouts in seconds, retries only for requests the gateway never processed
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = env.float('PAYMENT_GATEWAY_CONNECT_TIMEOUT', default=3.05)
+PAYMENT_GATEWAY_READ_TIMEOUT = env.float('PAYMENT_GATEWAY_READ_TIMEOUT', default=10)
+PAYMENT_GATEWAY_MAX_RETRIES = env.int('PAYMENT_GATEWAY_MAX_RETRIES', default=2)
+PAYMENT_GATEWAY_BACKOFF_FACTOR = env.float('PAYMENT_GATEWAY_BACKOFF_FACTOR', default=0.3)
+PAYMENT_GATEWAY_POOL_SIZE = env.int('PAYMENT_GATEWAY_POOL_SIZE', default=10)
+
+# Circuit breaker: opens when this share of the last calls failed or were slower than SLOW_CALL seconds
+PAYMENT_GATEWAY_BREAKER_FAILURE_RATE = env.float('PAYMENT_GATEWAY_BREAKER_FAILURE_RATE', default=0.5)
+PAYMENT_GATEWAY_BREAKER_WINDOW = env.int('PAYMENT_GATEWAY_BREAKER_WINDOW', default=20)
+PAYMENT_GATEWAY_BREAKER_MIN_CALLS = env.int('PAYMENT_GATEWAY_BREAKER_MIN_CALLS', default=10)
+PAYMENT_GATEWAY_BREAKER_SLOW_CALL = env.float('PAYMENT_GATEWAY_BREAKER_SLOW_CALL', default=5)
+PAYMENT_GATEWAY_BREAKER_RESET_TIMEOUT = env.float('PAYMENT_GATEWAY_BREAKER_RESET_TIMEOUT', default=30)
+
+# Store gateway callbacks in an inbox and apply them from celery instead of inside the request
+PAYMENT_CALLBACK_ASYNC = env.bool('PAYMENT_CALLBACK_ASYNC', default=False)
+PAYMENT_CALLBACK_BATCH_SIZE = env.int('PAYMENT_CALLBACK_BATCH_SIZE', default=500)
+PAYMENT_CALLBACK_SWEEP_INTERVAL = env.int('PAYMENT_CALLBACK_SWEEP_INTERVAL', default=60)
+# Callbacks that failed this many times are left in the inbox for `retry_payment_callbacks`
+PAYMENT_CALLBACK_MAX_ATTEMPTS = env.int('PAYMENT_CALLBACK_MAX_ATTEMPTS', default=5)
+
+# Count words in DOCX tables, text boxes, headers, footers and notes as well
+DOCX_WORD_COUNT_ALL_PARTS = env.bool('DOCX_WORD_COUNT_ALL_PARTS', default=False)
+
+# Extra modules registering file analyzers with fileprocessing.analyzers.register_analyzer
+FILE_ANALYZER_MODULES = env.list('FILE_ANALYZER_MODULES', default=[])
+
+# Text uploads of at least this many bytes are split into whitespace aligned byte
+# ranges and counted in parallel, either by a Celery chord of sub-tasks ("chord")
+# or by a process pool inside the task ("process", needs a threads or solo worker pool)
+WORD_COUNT_PARALLEL_THRESHOLD = env.int('WORD_COUNT_PARALLEL_THRESHOLD', default=64 * 1024 * 1024)
+WORD_COUNT_PARALLEL_PARTS = env.int('WORD_COUNT_PARALLEL_PARTS', default=os.cpu_count() or 4)
+WORD_COUNT_PARALLEL_BACKEND = env('WORD_COUNT_PARALLEL_BACKEND', default='chord')
+
+# Word counts of uploads up to WORD_COUNT_SMALL_FILE_MAX_SIZE bytes are queued on
+# WORD_COUNT_SMALL_QUEUE, larger ones on WORD_COUNT_LARGE_QUEUE, so large files never hold up small ones
+WORD_COUNT_SMALL_FILE_MAX_SIZE = env.int('WORD_COUNT_SMALL_FILE_MAX_SIZE', default=10 * 1024 * 1024)
+WORD_COUNT_SMALL_QUEUE = 'files_small'
+WORD_COUNT_LARGE_QUEUE = 'files_large'
+
+# Maximum number of files accepted by one batch upload request
+FILE_UPLOAD_BATCH_MAX_FILES = env.int('FILE_UPLOAD_BATCH_MAX_FILES', default=20)
+
+# Uploads are streamed straight to storage. Files over FILE_UPLOAD_MAX_SIZE bytes are refused,
+# and so are extensions missing from FILE_UPLOAD_ALLOWED_EXTENSIONS when it is set (e.g. .txt,.docx)
+FILE_UPLOAD_MAX_SIZE = env.int('FILE_UPLOAD_MAX_SIZE', default=1024 * 1024 * 1024)
+FILE_UPLOAD_ALLOWED_EXTENSIONS = env.list('FILE_UPLOAD_ALLOWED_EXTENSIONS', default=[])
+
+# Uploads are stored once per distinct content. Blobs no upload has referenced for
+# this many hours are deleted by the nightly collection
+UPLOAD_BLOB_GRACE_HOURS = env.int('UPLOAD_BLOB_GRACE_HOURS', default=24)
+
+# Upload file types to compress at rest, as extension=codec pairs (e.g. .txt=zstd,.csv=gzip).
+# zstd needs the zstandard package (in requirements.txt) to write and read blobs, new uploads
+# fall back to gzip without it. Empty stores files as is
+UPLOAD_COMPRESSION = env.dict('UPLOAD_COMPRESSION', default={})
+
+# Resumable uploads are sent in chunks of UPLOAD_CHUNK_SIZE bytes. Sessions without a new
+# chunk for UPLOAD_SESSION_TTL_HOURS expire and are deleted by an hourly task
+UPLOAD_CHUNK_SIZE = env.int('UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024)
+UPLOAD_SESSION_TTL_HOURS = env.int('UPLOAD_SESSION_TTL_HOURS', default=24)
+# Open sessions per user, never more than their upload credits left
+UPLOAD_SESSION_MAX_OPEN = env.int('UPLOAD_SESSION_MAX_OPEN', default=3)
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -146,11 +212,39 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Default page size of the cursor paginated listings, clients may ask for up to 500
+API_PAGE_SIZE = env.int('API_PAGE_SIZE', default=50)
+
+# Staff dashboard: rows per table page and days in the per-day breakdown
+DASHBOARD_PAGE_SIZE = env.int('DASHBOARD_PAGE_SIZE', default=25)
+DASHBOARD_DAYS = env.int('DASHBOARD_DAYS', default=14)
+
+# Stats rollups: refreshed every ROLLUP_INTERVAL seconds from rows changed since the last run,
+# re-reading ROLLUP_WATERMARK_OVERLAP seconds before it to catch late commits
+ROLLUP_INTERVAL = env.int('ROLLUP_INTERVAL', default=300)
+ROLLUP_WATERMARK_OVERLAP = env.int('ROLLUP_WATERMARK_OVERLAP', default=300)
+
 AUTH_USER_MODEL = "user.CustomUser"
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 
+# "sync" writes every activity log entry right away, "buffered" queues entries in-process
+# and writes them with one bulk insert per BUFFER_SIZE entries, BUFFER_MAX_AGE seconds,
+# finished request or celery task, and at shutdown
+ACTIVITY_LOG_BACKEND = env.str('ACTIVITY_LOG_BACKEND', default='sync')
+ACTIVITY_LOG_BUFFER_SIZE = env.int('ACTIVITY_LOG_BUFFER_SIZE', default=100)
+ACTIVITY_LOG_BUFFER_MAX_AGE = env.float('ACTIVITY_LOG_BUFFER_MAX_AGE', default=5)
+
+# Activity logs older than this many days are moved to monthly gzip JSONL files
+ACTIVITY_LOG_RETENTION_DAYS = env.int('ACTIVITY_LOG_RETENTION_DAYS', default=90)
+ACTIVITY_LOG_ARCHIVE_DIR = env('ACTIVITY_LOG_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'activity_logs'))
+
+# Shared cache, also used for monitoring counters. Point CACHE_URL at Redis
+# (e.g. redis://127.0.0.1:6379/2) so counters are shared between processes.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
 
 CELERY_BROKER_URL = "redis://127.0.0.1:6379/1"
 CELERY_RESULT_BACKEND = "django-db"
@@ -159,4 +253,47 @@ CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Dhaka"
-CELERY_RESULT_EXTENDED = True
\ No newline at end of file
+CELERY_RESULT_EXTENDED = True
+# A worker started without -Q consumes every queue listed here
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_QUEUES = (
+    Queue('celery'),
+    Queue(WORD_COUNT_SMALL_QUEUE),
+    Queue(WORD_COUNT_LARGE_QUEUE),
+)
+CELERY_TASK_ROUTES = {
+    'fileprocessing.tasks.count_words': {'queue': WORD_COUNT_SMALL_QUEUE},
+    # Only large files are split into ranges
+    'fileprocessing.tasks.count_words_range': {'queue': WORD_COUNT_LARGE_QUEUE},
+    'fileprocessing.tasks.finish_word_count': {'queue': WORD_COUNT_LARGE_QUEUE},
+    'fileprocessing.tasks.fail_parallel_word_count': {'queue': WORD_COUNT_LARGE_QUEUE},
+}
+# Task priorities 0 (first) to 9 on the Redis broker
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for inbox callbacks whose on-commit trigger was lost
+    'process-payment-callbacks': {
+        'task': 'payment.tasks.process_payment_callbacks',
+        'schedule': PAYMENT_CALLBACK_SWEEP_INTERVAL,
+    },
+    'archive-activity-logs': {
+        'task': 'fileprocessing.tasks.archive_old_activity_logs',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'update-stat-rollups': {
+        'task': 'dashboard.tasks.update_stat_rollups',
+        'schedule': ROLLUP_INTERVAL,
+    },
+    'collect-unused-upload-blobs': {
+        'task': 'fileprocessing.tasks.collect_unused_upload_blobs',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'expire-upload-sessions': {
+        'task': 'fileprocessing.tasks.expire_stale_upload_sessions',
+        'schedule': crontab(minute=30),
+    },
+}
\ No newline at end of file
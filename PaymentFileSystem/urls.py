@@ -15,16 +15,26 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from dashboard.views import dashboard
-from fileprocessing.views import ActivityLogList, FileListView, FileUploadAPIView
+from dashboard.views import RollupStatsView, dashboard
+from fileprocessing.views import (
+    ActivityLogList,
+    BatchFileUploadAPIView,
+    FileDownloadView,
+    FileListView,
+    FileUploadAPIView,
+    UploadChunkView,
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadSessionFinalizeView,
+    WordCountCacheStatsView,
+)
 from payment.views import (
     InitiatePayment,
     PaymentFailureAPIView,
+    PaymentGatewayStatsView,
     PaymentSuccessAPIView,
     TransctionsListView,
     payment_cancel,
@@ -44,12 +54,48 @@ urlpatterns = [
     ),
     path("api/payment/cancel/", payment_cancel, name="payment-cancel"),
     path("api/transactions/", TransctionsListView.as_view(), name="transactions-list"),
+    path(
+        "api/payment-gateway/stats/",
+        PaymentGatewayStatsView.as_view(),
+        name="payment-gateway-stats",
+    ),
     path("api/upload/", FileUploadAPIView.as_view(), name="file-upload"),
+    path(
+        "api/upload/batch/", BatchFileUploadAPIView.as_view(), name="batch-file-upload"
+    ),
+    path(
+        "api/upload/sessions/",
+        UploadSessionCreateView.as_view(),
+        name="upload-session-create",
+    ),
+    path(
+        "api/upload/sessions/<uuid:session_id>/",
+        UploadSessionDetailView.as_view(),
+        name="upload-session-detail",
+    ),
+    path(
+        "api/upload/sessions/<uuid:session_id>/chunks/<int:index>/",
+        UploadChunkView.as_view(),
+        name="upload-chunk",
+    ),
+    path(
+        "api/upload/sessions/<uuid:session_id>/finalize/",
+        UploadSessionFinalizeView.as_view(),
+        name="upload-session-finalize",
+    ),
     path("api/file/", FileListView.as_view(), name="file-list"),
+    path(
+        "api/file/<uuid:file_id>/download/",
+        FileDownloadView.as_view(),
+        name="file-download",
+    ),
     path("api/activity/", ActivityLogList.as_view(), name="activity-log-list"),
+    path(
+        "api/word-count-cache/stats/",
+        WordCountCacheStatsView.as_view(),
+        name="word-count-cache-stats",
+    ),
     path("api/dashboard/", dashboard, name="dashboard"),
+    path("api/stats/", RollupStatsView.as_view(), name="rollup-stats"),
     path("silk/", include("silk.urls", namespace="silk")),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,3 +1,43 @@
 from django.contrib import admin
+from .models import PaymentRollup, UploadRollup, RollupDeletion, RollupWatermark
 
-# Register your models here.
+@admin.register(PaymentRollup)
+class PaymentRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'start', 'user', 'status', 'count', 'amount']
+    list_filter = ['period', 'status']
+    search_fields = ['user__username']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(UploadRollup)
+class UploadRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'start', 'user', 'status', 'count', 'words']
+    list_filter = ['period', 'status']
+    search_fields = ['user__username']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(RollupDeletion)
+class RollupDeletionAdmin(admin.ModelAdmin):
+    list_display = ['source', 'user_id', 'time']
+    list_filter = ['source']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
@@ -0,0 +1,125 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from fileprocessing.choices import StatusChoice as FileStatus
+from fileprocessing.models import ActivityLog, FileUpload
+from payment.choices import StatusChoice as PaymentStatus
+from payment.models import PaymentTransaction
+from user.models import CustomUser
+
+from .rollups import PAYMENT_SOURCE, UPLOAD_SOURCE, get_rollup_totals, get_watermark
+
+
+def window_start(days):
+    """
+    Start of the local day `days - 1` days before today
+    """
+    today = timezone.localdate()
+    return timezone.make_aware(
+        datetime.combine(today - timedelta(days=days - 1), time.min)
+    )
+
+
+def get_totals(days):
+    """
+    Return overall file and payment counts and sums read from the daily rollups,
+    so they are as fresh as the last rollup update, and activities by action of
+    the last `days` days through the timestamp index
+    """
+    files = get_rollup_totals(UPLOAD_SOURCE)
+    payments = get_rollup_totals(PAYMENT_SOURCE)
+    activities = (
+        ActivityLog.objects.filter(timestamp__gte=window_start(days))
+        .values("action")
+        .annotate(total=Count("pk"))
+        .order_by()
+    )
+
+    return {
+        "users": CustomUser.objects.count(),
+        "updated_through": get_watermark(),
+        "files": {
+            "total": sum(row["count"] for row in files.values()),
+            "by_status": {
+                status: files[status]["count"] if status in files else 0
+                for status in FileStatus.values
+            },
+            "words": sum(row["words"] or 0 for row in files.values()),
+        },
+        "payments": {
+            "total": sum(row["count"] for row in payments.values()),
+            "by_status": {
+                status: payments[status]["count"] if status in payments else 0
+                for status in PaymentStatus.values
+            },
+            "paid_amount": (
+                payments[PaymentStatus.PAID]["amount"]
+                if PaymentStatus.PAID in payments
+                else 0
+            ),
+        },
+        "activities": {row["action"]: row["total"] for row in activities},
+    }
+
+
+def get_daily_breakdown(days):
+    """
+    Return per-day upload, payment and activity counts of the last `days` days,
+    newest first. Only rows of that window are read, through the time indexes.
+    Rows stamped in the future (clock skew) are left out.
+    """
+    tzinfo = timezone.get_current_timezone()
+    today = timezone.localdate()
+    since = window_start(days)
+    shown_days = [today - timedelta(days=offset) for offset in range(days)]
+    breakdown = {
+        day: {
+            "files": dict.fromkeys(FileStatus.values, 0),
+            "words": 0,
+            "payments": dict.fromkeys(PaymentStatus.values, 0),
+            "paid_amount": 0,
+            "activities": 0,
+        }
+        for day in shown_days
+    }
+
+    files = (
+        FileUpload.objects.filter(upload_time__gte=since)
+        .annotate(day=TruncDate("upload_time", tzinfo=tzinfo))
+        .values("day", "status")
+        .annotate(total=Count("pk"), words=Sum("word_count"))
+        .order_by()
+    )
+    for row in files:
+        if row["day"] in breakdown:
+            breakdown[row["day"]]["files"][row["status"]] = row["total"]
+            breakdown[row["day"]]["words"] += row["words"] or 0
+
+    payments = (
+        PaymentTransaction.objects.filter(timestamp__gte=since)
+        .annotate(day=TruncDate("timestamp", tzinfo=tzinfo))
+        .values("day", "status")
+        .annotate(total=Count("pk"), amount=Sum("amount"))
+        .order_by()
+    )
+    for row in payments:
+        if row["day"] in breakdown:
+            breakdown[row["day"]]["payments"][row["status"]] = row["total"]
+            if row["status"] == PaymentStatus.PAID:
+                breakdown[row["day"]]["paid_amount"] = row["amount"]
+
+    activities = (
+        ActivityLog.objects.filter(timestamp__gte=since)
+        .annotate(day=TruncDate("timestamp", tzinfo=tzinfo))
+        .values("day")
+        .annotate(total=Count("pk"))
+        .order_by()
+    )
+    for row in activities:
+        if row["day"] in breakdown:
+            breakdown[row["day"]]["activities"] = row["total"]
+
+    return [{"day": day, **values} for day, values in breakdown.items()]
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from django.db.models.signals import post_delete
+
+        from .rollups import ROLLUP_SOURCES, record_rollup_deletion
+
+        for source in ROLLUP_SOURCES:
+            post_delete.connect(
+                record_rollup_deletion,
+                sender=source.model,
+                dispatch_uid=f"record_rollup_deletion_{source.name}",
+            )
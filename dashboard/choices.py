@@ -0,0 +1,5 @@
+from django.db import models
+
+class PeriodChoice(models.TextChoices):
+        HOUR = "hour", "Hour"
+        DAY = "day", "Day"
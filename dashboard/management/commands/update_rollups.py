@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.rollups import update_rollups
+
+
+class Command(BaseCommand):
+    help = "Update the stats rollup tables from rows changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild every bucket instead of only those changed since the last run",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = update_rollups(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} hourly buckets"))
@@ -1,3 +1,54 @@
 from django.db import models
+from user.models import CustomUser
+from fileprocessing.choices import StatusChoice as FileStatusChoice
+from payment.choices import StatusChoice as PaymentStatusChoice
+from .choices import PeriodChoice
 
-# Create your models here.
+class PaymentRollup(models.Model):
+    period = models.CharField(max_length=4, choices=PeriodChoice.choices)
+    start = models.DateTimeField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="payment_rollups")
+    status = models.CharField(max_length=15, choices=PaymentStatusChoice.choices)
+    count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "start", "user", "status"], name="unique_payment_rollup")
+        ]
+        indexes = [models.Index(fields=['period', 'start'], name='payment_rollup_period_idx')]
+
+    def __str__(self):
+        return f"{self.count} {self.status} payments of {self.user.username} in the {self.period} from {self.start}"
+
+class UploadRollup(models.Model):
+    period = models.CharField(max_length=4, choices=PeriodChoice.choices)
+    start = models.DateTimeField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="upload_rollups")
+    status = models.CharField(max_length=15, choices=FileStatusChoice.choices)
+    count = models.PositiveIntegerField(default=0)
+    words = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "start", "user", "status"], name="unique_upload_rollup")
+        ]
+        indexes = [models.Index(fields=['period', 'start'], name='upload_rollup_period_idx')]
+
+    def __str__(self):
+        return f"{self.count} {self.status} uploads of {self.user.username} in the {self.period} from {self.start}"
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} rolled up through {self.value}"
+
+class RollupDeletion(models.Model):
+    source = models.CharField(max_length=20)
+    user_id = models.BigIntegerField()
+    time = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.source} row of user {self.user_id} at {self.time} deleted"
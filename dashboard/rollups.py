@@ -0,0 +1,282 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from fileprocessing.models import FileUpload
+from payment.choices import StatusChoice as PaymentStatusChoice
+from payment.models import PaymentTransaction
+
+from .choices import PeriodChoice
+from .models import PaymentRollup, RollupDeletion, RollupWatermark, UploadRollup
+
+WATERMARK_NAME = "stats"
+BUCKET_BATCH_SIZE = 100
+
+
+class RollupSource:
+    """
+    A source table rolled up per user, status and hour/day of `time_field`,
+    with a row count and the sum of each column in `sums`.
+
+    Changed rows are found by their `updated_at`, deleted rows by the
+    RollupDeletion marks their post_delete receiver leaves.
+    """
+
+    def __init__(self, name, model, rollup_model, time_field, sums):
+        self.name = name
+        self.model = model
+        self.rollup_model = rollup_model
+        self.time_field = time_field
+        self.sums = sums
+
+    def dirty_hours(self, since, until):
+        """
+        Return the (user id, hour) buckets of rows created or changed in (since, until]
+        """
+        rows = self.model.objects.filter(updated_at__lte=until)
+        if since is not None:
+            rows = rows.filter(updated_at__gt=since)
+
+        return set(
+            rows.annotate(
+                hour=TruncHour(self.time_field, tzinfo=timezone.get_current_timezone())
+            )
+            .values_list("user_id", "hour")
+            .distinct()
+        )
+
+    def deleted_hours(self):
+        """
+        Return the ids of the deletion marks of this source and the
+        (user id, hour) buckets of the rows they stand for
+        """
+        marks = list(
+            RollupDeletion.objects.filter(source=self.name).values_list(
+                "pk", "user_id", "time"
+            )
+        )
+        return (
+            [pk for pk, _, _ in marks],
+            {(user_id, local_hour_start(time)) for _, user_id, time in marks},
+        )
+
+    def rebuild_hours(self, user_id, hours):
+        """
+        Recompute the hourly rollups of one user's hours from the source table
+        """
+        in_hours = Q()
+        for hour in hours:
+            in_hours |= Q(
+                **{
+                    f"{self.time_field}__gte": hour,
+                    f"{self.time_field}__lt": hour + timedelta(hours=1),
+                }
+            )
+
+        rows = (
+            self.model.objects.filter(in_hours, user_id=user_id)
+            .annotate(
+                hour=TruncHour(self.time_field, tzinfo=timezone.get_current_timezone())
+            )
+            .values("hour", "status")
+            .annotate(
+                count=Count("pk"),
+                **{name: Sum(column) for name, column in self.sums.items()},
+            )
+            .order_by()
+        )
+        self.replace(PeriodChoice.HOUR, user_id, hours, rows, "hour")
+
+    def rebuild_days(self, user_id, days):
+        """
+        Recompute the daily rollups of one user's days from the hourly rollups
+        """
+        rows = (
+            self.rollup_model.objects.filter(
+                period=PeriodChoice.HOUR,
+                user_id=user_id,
+                start__gte=min(days),
+                start__lt=max(days) + timedelta(days=1),
+            )
+            .annotate(day=TruncDay("start", tzinfo=timezone.get_current_timezone()))
+            .values("day", "status")
+            .annotate(count=Sum("count"), **{name: Sum(name) for name in self.sums})
+            .order_by()
+        )
+        rows = [row for row in rows if row["day"] in days]
+        self.replace(PeriodChoice.DAY, user_id, days, rows, "day")
+
+    def replace(self, period, user_id, starts, rows, start_key):
+        self.rollup_model.objects.filter(
+            period=period, user_id=user_id, start__in=list(starts)
+        ).delete()
+        self.rollup_model.objects.bulk_create(
+            [
+                self.rollup_model(
+                    period=period,
+                    start=row[start_key],
+                    user_id=user_id,
+                    status=row["status"],
+                    count=row["count"],
+                    **{name: row[name] or 0 for name in self.sums},
+                )
+                for row in rows
+            ]
+        )
+
+    def update(self, since, until):
+        """
+        Rebuild every hourly and daily bucket touched by rows changed in
+        (since, until] or deleted since the last update, and return how many hourly
+        buckets were rebuilt. Without `since` every bucket is rebuilt from scratch.
+        """
+        mark_ids, deleted = self.deleted_hours()
+        if since is None:
+            self.rollup_model.objects.all().delete()
+            deleted = set()
+
+        hours_by_user = defaultdict(set)
+        for user_id, hour in self.dirty_hours(since, until) | deleted:
+            hours_by_user[user_id].add(hour)
+
+        for user_id, hours in hours_by_user.items():
+            hours = sorted(hours)
+            for offset in range(0, len(hours), BUCKET_BATCH_SIZE):
+                self.rebuild_hours(user_id, hours[offset : offset + BUCKET_BATCH_SIZE])
+
+            days = sorted({local_day_start(hour) for hour in hours})
+            for offset in range(0, len(days), BUCKET_BATCH_SIZE):
+                self.rebuild_days(user_id, days[offset : offset + BUCKET_BATCH_SIZE])
+
+        # Marks left by deletes committed during this update are kept for the next one
+        RollupDeletion.objects.filter(pk__in=mark_ids).delete()
+        return sum(len(hours) for hours in hours_by_user.values())
+
+
+def local_hour_start(value):
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def local_day_start(value):
+    return timezone.localtime(value).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+PAYMENT_SOURCE = RollupSource(
+    "payments", PaymentTransaction, PaymentRollup, "timestamp", {"amount": "amount"}
+)
+UPLOAD_SOURCE = RollupSource(
+    "uploads", FileUpload, UploadRollup, "upload_time", {"words": "word_count"}
+)
+ROLLUP_SOURCES = [PAYMENT_SOURCE, UPLOAD_SOURCE]
+
+
+def record_rollup_deletion(sender, instance, **kwargs):
+    """
+    post_delete receiver marking the bucket of a deleted source row for rebuilding.
+    The mark is written in the deleting transaction, so it is never lost or left
+    behind by a rollback.
+    """
+    for source in ROLLUP_SOURCES:
+        if source.model is sender:
+            RollupDeletion.objects.create(
+                source=source.name,
+                user_id=instance.user_id,
+                time=getattr(instance, source.time_field),
+            )
+
+
+def update_rollups(full=False):
+    """
+    Bring the rollup tables up to date with the rows changed since the watermark.
+    The window reaches ROLLUP_WATERMARK_OVERLAP seconds before the watermark, so
+    rows committed late by slow transactions are still picked up; rebuilding a
+    bucket twice is harmless. Returns the number of hourly buckets rebuilt.
+    """
+    until = timezone.now()
+    with transaction.atomic():
+        watermark = (
+            RollupWatermark.objects.select_for_update()
+            .filter(name=WATERMARK_NAME)
+            .first()
+        )
+        since = None
+        if watermark is not None and not full:
+            since = watermark.value - timedelta(
+                seconds=settings.ROLLUP_WATERMARK_OVERLAP
+            )
+
+        rebuilt = sum(source.update(since, until) for source in ROLLUP_SOURCES)
+
+        RollupWatermark.objects.update_or_create(
+            name=WATERMARK_NAME, defaults={"value": until}
+        )
+
+    return rebuilt
+
+
+def _rollup_totals(source, period, start, end, user_id):
+    rows = source.rollup_model.objects.filter(period=period, start__gte=start)
+    if end is not None:
+        rows = rows.filter(start__lt=end)
+    if user_id is not None:
+        rows = rows.filter(user_id=user_id)
+
+    return (
+        rows.values("start", "status")
+        .annotate(count=Sum("count"), **{name: Sum(name) for name in source.sums})
+        .order_by()
+    )
+
+
+def get_rollup_totals(source):
+    """
+    Return the count and sums of every status of a source, all time, from its
+    daily rollups
+    """
+    rows = (
+        source.rollup_model.objects.filter(period=PeriodChoice.DAY)
+        .values("status")
+        .annotate(count=Sum("count"), **{name: Sum(name) for name in source.sums})
+        .order_by()
+    )
+    return {row["status"]: row for row in rows}
+
+
+def get_watermark():
+    """
+    Return the time the rollups are up to date through, None before the first update
+    """
+    return (
+        RollupWatermark.objects.filter(name=WATERMARK_NAME)
+        .values_list("value", flat=True)
+        .first()
+    )
+
+
+def get_rollup_stats(period, start, end=None, user_id=None):
+    """
+    Return per-period payment and upload totals in the [start, end) range, all
+    users together unless `user_id` is given. Reads only the rollup tables.
+    """
+    buckets = defaultdict(
+        lambda: {"payments": {}, "revenue": Decimal("0.00"), "uploads": {}, "words": 0}
+    )
+
+    for row in _rollup_totals(PAYMENT_SOURCE, period, start, end, user_id):
+        bucket = buckets[row["start"]]
+        bucket["payments"][row["status"]] = row["count"]
+        if row["status"] == PaymentStatusChoice.PAID:
+            bucket["revenue"] = row["amount"]
+
+    for row in _rollup_totals(UPLOAD_SOURCE, period, start, end, user_id):
+        bucket = buckets[row["start"]]
+        bucket["uploads"][row["status"]] = row["count"]
+        bucket["words"] += row["words"]
+
+    return [{"start": start, **values} for start, values in sorted(buckets.items())]
@@ -0,0 +1,19 @@
+import logging
+
+from celery import shared_task
+
+from .rollups import update_rollups
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_stat_rollups():
+    """
+    Celery beat task bringing the stats rollup tables up to date
+    """
+    try:
+        return update_rollups()
+    except Exception as e:
+        logger.error(f"Error in update_stat_rollups: {str(e)}", exc_info=True)
+        return "Error"
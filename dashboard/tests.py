@@ -1,3 +1,198 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from fileprocessing.choices import StatusChoice as FileStatusChoice
+from fileprocessing.models import FileUpload
+from payment.choices import StatusChoice as PaymentStatusChoice
+from payment.models import PaymentTransaction
+from user.models import CustomUser
+
+from .choices import PeriodChoice
+from .models import PaymentRollup, RollupDeletion, UploadRollup
+from .rollups import update_rollups
+
+
+def create_user(username, is_staff=False):
+    return CustomUser.objects.create_user(
+        username=username,
+        password="password",
+        email=f"{username}@example.com",
+        mobile_number="01700000000",
+        is_staff=is_staff,
+    )
+
+
+def rollup_rows():
+    return (
+        sorted(
+            PaymentRollup.objects.values_list(
+                "period", "start", "user_id", "status", "count", "amount"
+            )
+        ),
+        sorted(
+            UploadRollup.objects.values_list(
+                "period", "start", "user_id", "status", "count", "words"
+            )
+        ),
+    )
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = create_user("alice")
+        self.other = create_user("bob")
+        now = timezone.now()
+        for hours_ago, words in [(0, 10), (0, 5), (7, 20), (30, 40)]:
+            upload = FileUpload.objects.create(
+                user=self.user,
+                file="uploads/notes.txt",
+                filename="notes.txt",
+                word_count=words,
+                status=FileStatusChoice.COMPLETED,
+            )
+            FileUpload.objects.filter(pk=upload.pk).update(
+                upload_time=now - timedelta(hours=hours_ago)
+            )
+        for number in range(2):
+            PaymentTransaction.objects.create(
+                user=self.other,
+                transaction_id=f"PAY_{number}",
+                status=PaymentStatusChoice.PAID,
+            )
+        update_rollups()
+
+    def upload_totals(self, period=PeriodChoice.DAY):
+        rows = UploadRollup.objects.filter(period=period, user=self.user)
+        return sum(row.count for row in rows), sum(row.words for row in rows)
+
+    def test_rollups_count_every_row(self):
+        self.assertEqual(self.upload_totals(), (4, 75))
+        self.assertEqual(self.upload_totals(PeriodChoice.HOUR), (4, 75))
+        paid = PaymentRollup.objects.get(period=PeriodChoice.DAY, user=self.other)
+        self.assertEqual((paid.status, paid.count), (PaymentStatusChoice.PAID, 2))
+
+    def test_incremental_update_matches_full_rebuild(self):
+        FileUpload.objects.create(
+            user=self.user,
+            file="uploads/more.txt",
+            filename="more.txt",
+            word_count=7,
+            status=FileStatusChoice.COMPLETED,
+        )
+        PaymentTransaction.objects.create(user=self.other, transaction_id="PAY_NEW")
+        update_rollups()
+        incremental = rollup_rows()
+
+        update_rollups(full=True)
+        self.assertEqual(rollup_rows(), incremental)
+
+    def test_deleted_rows_are_subtracted(self):
+        FileUpload.objects.filter(word_count__in=[5, 40]).delete()
+        self.assertEqual(RollupDeletion.objects.count(), 2)
+
+        update_rollups()
+
+        self.assertEqual(self.upload_totals(), (2, 30))
+        self.assertEqual(self.upload_totals(PeriodChoice.HOUR), (2, 30))
+        self.assertFalse(RollupDeletion.objects.exists())
+
+    def test_full_rebuild_empties_buckets_of_deleted_rows(self):
+        PaymentTransaction.objects.filter(user=self.other).delete()
+
+        update_rollups(full=True)
+
+        self.assertFalse(PaymentRollup.objects.filter(user=self.other).exists())
+        self.assertFalse(RollupDeletion.objects.exists())
+
+
+class RollupStatsViewTests(TestCase):
+    def setUp(self):
+        self.staff = create_user("admin", is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_invalid_user_is_rejected(self):
+        response = self.client.get("/api/stats/?user=abc")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_by_user(self):
+        user = create_user("alice")
+        PaymentTransaction.objects.create(
+            user=user, transaction_id="PAY_A", status=PaymentStatusChoice.PAID
+        )
+        PaymentTransaction.objects.create(
+            user=self.staff, transaction_id="PAY_S", status=PaymentStatusChoice.PAID
+        )
+        update_rollups()
+
+        response = self.client.get(f"/api/stats/?user={user.pk}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [bucket["payments"] for bucket in response.data["buckets"]],
+            [{PaymentStatusChoice.PAID: 1}],
+        )
+
+    def test_regular_users_are_refused(self):
+        client = APIClient()
+        client.force_authenticate(create_user("alice"))
+
+        self.assertEqual(client.get("/api/stats/").status_code, 403)
+
+
+@override_settings(DASHBOARD_PAGE_SIZE=4)
+class DashboardViewTests(TestCase):
+    def setUp(self):
+        self.staff = create_user("admin", is_staff=True)
+        self.client.force_login(self.staff)
+        for number in range(10):
+            FileUpload.objects.create(
+                user=self.staff,
+                file="uploads/notes.txt",
+                filename=f"file-{number}.txt",
+                word_count=number,
+                status=FileStatusChoice.COMPLETED,
+            )
+
+    def test_totals_come_from_rollups(self):
+        response = self.client.get("/api/dashboard/")
+        self.assertEqual(response.context["totals"]["files"]["total"], 0)
+
+        update_rollups()
+        response = self.client.get("/api/dashboard/")
+
+        files = response.context["totals"]["files"]
+        self.assertEqual(files["total"], 10)
+        self.assertEqual(files["by_status"][FileStatusChoice.COMPLETED], 10)
+        self.assertEqual(files["words"], 45)
+
+    def test_file_table_pages_by_cursor(self):
+        seen = []
+        url = "/api/dashboard/"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(
+                any(
+                    "OFFSET" in query["sql"]
+                    for query in queries.captured_queries
+                    if FileUpload._meta.db_table in query["sql"]
+                )
+            )
+
+            seen += [upload.filename for upload in response.context["files"]]
+            url = response.context["files_page"]["next"]
+
+        self.assertEqual(seen, [f"file-{number}.txt" for number in reversed(range(10))])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get("/api/dashboard/?files_cursor=invalid")
+
+        self.assertEqual(response.status_code, 404)
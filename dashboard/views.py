@@ -1,28 +1,136 @@
 import logging
+from datetime import timedelta
+from types import SimpleNamespace
 
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.views import APIView
 
 from fileprocessing.models import ActivityLog, FileUpload
 from payment.models import PaymentTransaction
+from utils.dates import parse_date_range
+from utils.filters import get_user_param
+from utils.pagination import KeysetPagination
+
+from .aggregates import get_daily_breakdown, get_totals
+from .choices import PeriodChoice
+from .rollups import get_rollup_stats, get_watermark
 
 logger = logging.getLogger(__name__)
 
 
+def get_table_page(request, name, queryset, keyset_field):
+    """
+    Return one keyset page of a dashboard table and its navigation links. Each table
+    has its own cursor parameter, so paging one keeps the others where they are.
+    """
+    paginator = KeysetPagination()
+    paginator.cursor_query_param = f"{name}_cursor"
+    paginator.page_size = settings.DASHBOARD_PAGE_SIZE
+    paginator.page_size_query_param = None
+    view = SimpleNamespace(keyset_field=keyset_field, queryset=queryset)
+    request = Request(request)
+
+    rows = paginator.paginate_queryset(queryset, request, view)
+    first = None
+    if paginator.cursor is not None:
+        first = remove_query_param(
+            request.build_absolute_uri(), paginator.cursor_query_param
+        )
+
+    return rows, {"first": first, "next": paginator.get_next_link()}
+
+
 @staff_member_required
 def dashboard(request):
     """
-    Render dashboard page, showing all user's files, payments and activity logs. Only staff member can do this .
+    Render dashboard page with summary aggregates of all user's files, payments and
+    activity logs, and paginated tables of the recent ones. Only staff member can do this .
     """
     try:
-        files = FileUpload.objects.all().order_by("-upload_time")
-        payments = PaymentTransaction.objects.all().order_by("-timestamp")
-        activities = ActivityLog.objects.all().order_by("-timestamp")
+        tables = {
+            "files": (FileUpload.objects.select_related("user"), "upload_time"),
+            "payments": (
+                PaymentTransaction.objects.select_related("user"),
+                "timestamp",
+            ),
+            "activities": (ActivityLog.objects.select_related("user"), "timestamp"),
+        }
 
-        context = {"files": files, "payments": payments, "activities": activities}
+        context = {
+            "totals": get_totals(settings.DASHBOARD_DAYS),
+            "daily": get_daily_breakdown(settings.DASHBOARD_DAYS),
+        }
+        for name, (queryset, keyset_field) in tables.items():
+            context[name], context[f"{name}_page"] = get_table_page(
+                request, name, queryset, keyset_field
+            )
 
         return render(request, "dashboard/dashboard.html", context)
+    except NotFound as e:
+        return JsonResponse({"message": str(e.detail)}, status=404)
     except Exception as e:
         logger.error(f"Error fetch dashboard data=> {e}", exc_info=True)
         return JsonResponse({"message": "Error loading dashboard data"}, status=500)
+
+
+class RollupStatsView(APIView):
+    """
+    API view serving hourly or daily payment and upload statistics, read only from
+    the rollup tables(Admin Only)
+    """
+
+    permission_classes = [IsAdminUser]
+    default_ranges = {
+        PeriodChoice.HOUR: timedelta(hours=48),
+        PeriodChoice.DAY: timedelta(days=30),
+    }
+
+    def get(self, request):
+        period = request.query_params.get("period", PeriodChoice.DAY)
+        if period not in PeriodChoice.values:
+            return Response(
+                {"detail": f"period must be one of {', '.join(PeriodChoice.values)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            start, end = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        user_id = get_user_param(request)
+
+        try:
+            start = start or timezone.now() - self.default_ranges[period]
+            buckets = get_rollup_stats(period, start, end, user_id)
+            updated_through = get_watermark()
+
+            return Response(
+                {
+                    "period": period,
+                    "updated_through": updated_through,
+                    "buckets": [
+                        {
+                            **bucket,
+                            "start": timezone.localtime(bucket["start"]),
+                            "revenue": f"{bucket['revenue']:.2f}",
+                        }
+                        for bucket in buckets
+                    ],
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error fetching rollup stats=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server Error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FileUpload, ActivityLog
+from .models import FileUpload, ActivityLog, ActivityLogArchive, StoredBlob, UploadSession, WordCountResult
 
 @admin.register(FileUpload)
 class FileUploadAdmin(admin.ModelAdmin):
@@ -21,4 +21,46 @@ class ActivityLogAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj = None):
         return False
     def has_change_permission(self, request, obj = None):
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(WordCountResult)
+class WordCountResultAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'analyzer', 'word_count', 'created_at']
+    list_filter = ['analyzer']
+    search_fields = ['content_hash']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(ActivityLogArchive)
+class ActivityLogArchiveAdmin(admin.ModelAdmin):
+    list_display = ['month', 'path', 'row_count', 'first_timestamp', 'last_timestamp', 'created_at']
+    list_filter = ['month']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at', 'updated_at']
+    search_fields = ['name', 'content_hash']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'size', 'status', 'created_at', 'expires_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'user__username']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
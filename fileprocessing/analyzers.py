@@ -0,0 +1,370 @@
+import csv
+import gzip
+import io
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+from .parallel import count_words_in_range
+from .wordcount import (
+    DOCX_MAIN_PART,
+    TXT_WORD_RE,
+    ByteStreamWordCounter,
+    StreamingWordCounter,
+    count_matches,
+    count_words_in_chunks,
+    count_words_in_docx,
+    count_words_in_mapped_file,
+    iter_chunks,
+)
+
+DOCX_MIME_TYPE = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+
+_analyzers_by_extension = {}
+_analyzers_by_mime_type = {}
+
+
+class FileAnalyzer:
+    """
+    Base class for word count analyzers.
+
+    Subclasses declare the extensions and MIME types they handle and implement
+    `count`, which must read the file in a single streaming pass.
+    Bump `version` whenever a change alters the counts an analyzer produces.
+    """
+
+    name = None
+    version = 1
+    extensions = ()
+    mime_types = ()
+    # Splittable analyzers can count independent byte ranges of large files in parallel
+    splittable = False
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.version}"
+
+    def count(self, file_path):
+        raise NotImplementedError
+
+    def count_file(self, f):
+        """
+        Count words read from an open binary file, such as a decompressing stream,
+        in one forward pass
+        """
+        raise NotImplementedError(f"{self.name} files can not be counted from a stream")
+
+    def byte_counter(self):
+        """
+        Return a counter fed raw byte chunks with `feed` and finished with `close`,
+        giving the same count as `count`. None when the format can only be counted
+        from a complete file.
+        """
+        return None
+
+
+class TextStreamAnalyzer(FileAnalyzer):
+    """
+    Base class for analyzers of text formats, which count from an open text stream
+    """
+
+    encoding = "utf-8"
+    newline = None
+
+    def open_text(self, file_path):
+        return open(
+            file_path,
+            "r",
+            encoding=self.encoding,
+            errors="replace",
+            newline=self.newline,
+        )
+
+    def count(self, file_path):
+        with self.open_text(file_path) as f:
+            return self.count_stream(f)
+
+    def count_file(self, f):
+        text = io.TextIOWrapper(
+            f, encoding=self.encoding, errors="replace", newline=self.newline
+        )
+        try:
+            return self.count_stream(text)
+        finally:
+            # Leave the binary file to the caller
+            text.detach()
+
+    def count_stream(self, f):
+        raise NotImplementedError
+
+
+def register_analyzer(cls):
+    """
+    Class decorator registering an analyzer for its extensions and MIME types
+    """
+    analyzer = cls()
+    for extension in cls.extensions:
+        _analyzers_by_extension[extension.lower()] = analyzer
+    for mime_type in cls.mime_types:
+        _analyzers_by_mime_type[mime_type] = analyzer
+
+    return cls
+
+
+def get_registered_analyzers():
+    """
+    Return every registered analyzer once, keyed by name
+    """
+    analyzers = list(_analyzers_by_extension.values())
+    analyzers += list(_analyzers_by_mime_type.values())
+    return {analyzer.name: analyzer for analyzer in analyzers}
+
+
+def sniff_mime_type(file_path):
+    """
+    Guess the MIME type of a file from its leading bytes
+    """
+    with open(file_path, "rb") as f:
+        head = f.read(2048)
+
+    if head.startswith(b"\x1f\x8b"):
+        return "application/gzip"
+
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                if DOCX_MAIN_PART in archive.namelist():
+                    return DOCX_MIME_TYPE
+        except zipfile.BadZipFile:
+            return None
+        return "application/zip"
+
+    if head.lstrip().lower().startswith((b"<!doctype html", b"<html")):
+        return "text/html"
+
+    if head and b"\x00" not in head:
+        return "text/plain"
+
+    return None
+
+
+@register_analyzer
+class PlainTextAnalyzer(TextStreamAnalyzer):
+    name = "txt"
+    extensions = (".txt", ".text", ".log")
+    mime_types = ("text/plain",)
+    splittable = True
+
+    def count(self, file_path):
+        return count_words_in_mapped_file(file_path, encoding=self.encoding)
+
+    def count_file(self, f):
+        counter = self.byte_counter()
+        for chunk in iter_chunks(f):
+            counter.feed(chunk)
+
+        return counter.close()
+
+    def byte_counter(self):
+        return ByteStreamWordCounter(self.encoding, TXT_WORD_RE)
+
+    def count_stream(self, f):
+        return count_words_in_chunks(iter_chunks(f), TXT_WORD_RE)
+
+    def count_range(self, file_path, start, end):
+        return count_words_in_range(file_path, start, end, self.encoding)
+
+
+@register_analyzer
+class DocxAnalyzer(FileAnalyzer):
+    name = "docx"
+    extensions = (".docx",)
+    mime_types = (DOCX_MIME_TYPE,)
+    # Bytes of a stream held in memory before count_file spills it to disk
+    spool_size = 8 * 1024 * 1024
+
+    @property
+    def key(self):
+        # Counts differ with the parts counted, cached results must not be shared
+        parts = "all" if settings.DOCX_WORD_COUNT_ALL_PARTS else "main"
+        return f"{super().key}:{parts}"
+
+    def count(self, file_path):
+        return count_words_in_docx(
+            file_path, include_all_parts=settings.DOCX_WORD_COUNT_ALL_PARTS
+        )
+
+    def count_file(self, f):
+        # The zip directory is at the end, spool the stream to a seekable file first
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_size) as spool:
+            shutil.copyfileobj(f, spool)
+            spool.seek(0)
+            return count_words_in_docx(
+                spool, include_all_parts=settings.DOCX_WORD_COUNT_ALL_PARTS
+            )
+
+
+@register_analyzer
+class CsvAnalyzer(TextStreamAnalyzer):
+    name = "csv"
+    extensions = (".csv",)
+    mime_types = ("text/csv",)
+    newline = ""
+    dialect = "excel"
+
+    def count_stream(self, f):
+        return sum(
+            count_matches(TXT_WORD_RE, field)
+            for row in csv.reader(f, self.dialect)
+            for field in row
+        )
+
+
+@register_analyzer
+class TsvAnalyzer(CsvAnalyzer):
+    name = "tsv"
+    extensions = (".tsv",)
+    mime_types = ("text/tab-separated-values",)
+    dialect = "excel-tab"
+
+
+@register_analyzer
+class MarkdownAnalyzer(TextStreamAnalyzer):
+    """
+    Count words in Markdown, ignoring link targets, inline HTML and markup characters
+    """
+
+    name = "markdown"
+    extensions = (".md", ".markdown")
+    mime_types = ("text/markdown", "text/x-markdown")
+
+    _LINK_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+    _TAG_RE = re.compile(r"<[^>\n]+>")
+    _MARKUP_RE = re.compile(r"[*_`~#>|]+")
+
+    def strip_markup(self, line):
+        line = self._LINK_RE.sub(r"\1", line)
+        line = self._TAG_RE.sub(" ", line)
+        return self._MARKUP_RE.sub(" ", line)
+
+    def count_stream(self, f):
+        counter = StreamingWordCounter(TXT_WORD_RE)
+        for line in f:
+            counter.feed(self.strip_markup(line))
+
+        return counter.close()
+
+
+class _HTMLTextCounter(HTMLParser):
+    BLOCK_TAGS = set(
+        "address article aside blockquote br dd div dl dt figcaption footer "
+        "form h1 h2 h3 h4 h5 h6 header hr li main nav ol p pre section table "
+        "td th tr ul".split()
+    )
+    SKIPPED_TAGS = {"script", "style", "template", "noscript"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.counter = StreamingWordCounter(TXT_WORD_RE)
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.counter.feed("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in self.BLOCK_TAGS:
+            self.counter.feed("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.counter.feed(data)
+
+
+@register_analyzer
+class HTMLAnalyzer(TextStreamAnalyzer):
+    """
+    Count words in the visible text of an HTML document
+    """
+
+    name = "html"
+    extensions = (".html", ".htm", ".xhtml")
+    mime_types = ("text/html", "application/xhtml+xml")
+
+    def count_stream(self, f):
+        parser = _HTMLTextCounter()
+        for chunk in iter_chunks(f):
+            parser.feed(chunk)
+        parser.close()
+
+        return parser.counter.close()
+
+
+@register_analyzer
+class GzipAnalyzer(FileAnalyzer):
+    """
+    Count words in gzip-compressed text, decompressing on the fly.
+    The inner format comes from the name without `.gz` and is plain text by default.
+    """
+
+    name = "gzip"
+    extensions = (".gz",)
+    mime_types = ("application/gzip", "application/x-gzip")
+
+    def __init__(self, inner=None):
+        self.inner = inner or PlainTextAnalyzer()
+
+    @property
+    def key(self):
+        return f"{super().key}+{self.inner.key}"
+
+    def with_inner(self, inner):
+        if not isinstance(inner, TextStreamAnalyzer):
+            return self
+        return GzipAnalyzer(inner)
+
+    def count(self, file_path):
+        with gzip.open(
+            file_path,
+            "rt",
+            encoding=self.inner.encoding,
+            errors="replace",
+            newline=self.inner.newline,
+        ) as f:
+            return self.inner.count_stream(f)
+
+    def count_file(self, f):
+        with gzip.GzipFile(fileobj=f, mode="rb") as inner:
+            return self.inner.count_file(inner)
+
+
+def get_analyzer(filename, file_path=None):
+    """
+    Find the analyzer for a file by extension, then by its guessed or sniffed MIME type
+    """
+    stem, extension = os.path.splitext(filename.lower())
+    analyzer = _analyzers_by_extension.get(extension)
+
+    if analyzer is None:
+        mime_type, _ = mimetypes.guess_type(filename)
+        analyzer = _analyzers_by_mime_type.get(mime_type)
+
+    if analyzer is None and file_path is not None:
+        analyzer = _analyzers_by_mime_type.get(sniff_mime_type(file_path))
+
+    if isinstance(analyzer, GzipAnalyzer):
+        return analyzer.with_inner(get_analyzer(stem))
+
+    return analyzer
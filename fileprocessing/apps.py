@@ -1,6 +1,46 @@
+from importlib import import_module
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class FileprocessingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fileprocessing'
+
+    def ready(self):
+        # Register the built-in analyzers, then any extra ones listed in settings
+        import_module("fileprocessing.analyzers")
+        for module in settings.FILE_ANALYZER_MODULES:
+            import_module(module)
+
+        from django.db.models.signals import post_delete
+
+        from .storage import release_deleted_upload_blob
+
+        post_delete.connect(
+            release_deleted_upload_blob,
+            sender="fileprocessing.FileUpload",
+            dispatch_uid="release_deleted_upload_blob",
+        )
+
+        if settings.ACTIVITY_LOG_BACKEND == "buffered":
+            self.connect_activity_log_flush()
+
+    def connect_activity_log_flush(self):
+        """
+        Write buffered activity logs once a response was sent or a celery task ended
+        """
+        from celery.signals import task_postrun, worker_process_shutdown
+        from django.core.signals import request_finished
+
+        from utils.logger import flush_activity_logs
+
+        request_finished.connect(
+            flush_activity_logs, dispatch_uid="flush_activity_logs"
+        )
+        task_postrun.connect(flush_activity_logs, dispatch_uid="flush_activity_logs")
+        # Prefork children exit without running atexit handlers
+        worker_process_shutdown.connect(
+            flush_activity_logs, dispatch_uid="flush_activity_logs"
+        )
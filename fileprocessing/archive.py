@@ -0,0 +1,187 @@
+import gzip
+import heapq
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ActivityLog, ActivityLogArchive
+
+ARCHIVE_FIELDS = ["activity_id", "user_id", "action", "metadata", "timestamp"]
+DELETE_BATCH_SIZE = 500
+
+
+def get_archive_cutoff():
+    """
+    Return the time before which activity logs are moved to the archive
+    """
+    return timezone.now() - timedelta(days=settings.ACTIVITY_LOG_RETENTION_DAYS)
+
+
+def _month_start(value):
+    value = timezone.localtime(value)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _encode(row):
+    return json.dumps(
+        {
+            "activity_id": str(row["activity_id"]),
+            "user_id": row["user_id"],
+            "action": row["action"],
+            "metadata": row["metadata"],
+            "timestamp": row["timestamp"].isoformat(),
+        }
+    )
+
+
+def archive_month(month, cutoff):
+    """
+    Move the activity logs of one month older than `cutoff` to a gzip JSONL file
+    and index it. Returns the number of archived rows.
+
+    The file is complete on disk before the rows are deleted, so a failure leaves
+    the rows in the live table and at worst an unindexed file that is never read.
+    """
+    rows = (
+        ActivityLog.objects.filter(
+            timestamp__gte=month, timestamp__lt=min(_next_month(month), cutoff)
+        )
+        .order_by("timestamp")
+        .values(*ARCHIVE_FIELDS)
+    )
+
+    directory = os.path.join(settings.ACTIVITY_LOG_ARCHIVE_DIR, f"{month:%Y}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{month:%Y-%m}-{uuid.uuid4().hex[:8]}.jsonl.gz")
+
+    activity_ids = []
+    first_timestamp = last_timestamp = None
+    with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as f:
+        for row in rows.iterator(chunk_size=2000):
+            f.write(_encode(row) + "\n")
+            activity_ids.append(row["activity_id"])
+            first_timestamp = first_timestamp or row["timestamp"]
+            last_timestamp = row["timestamp"]
+
+    if not activity_ids:
+        os.remove(f"{path}.tmp")
+        return 0
+    os.replace(f"{path}.tmp", path)
+
+    with transaction.atomic():
+        ActivityLogArchive.objects.create(
+            month=month.date(),
+            path=os.path.relpath(path, settings.ACTIVITY_LOG_ARCHIVE_DIR),
+            row_count=len(activity_ids),
+            first_timestamp=first_timestamp,
+            last_timestamp=last_timestamp,
+        )
+        for offset in range(0, len(activity_ids), DELETE_BATCH_SIZE):
+            ActivityLog.objects.filter(
+                activity_id__in=activity_ids[offset : offset + DELETE_BATCH_SIZE]
+            ).delete()
+
+    return len(activity_ids)
+
+
+def archive_activity_logs(cutoff=None):
+    """
+    Move every activity log older than the retention window to monthly archive
+    files. Returns the number of archived rows.
+    """
+    cutoff = cutoff or get_archive_cutoff()
+    oldest = (
+        ActivityLog.objects.filter(timestamp__lt=cutoff)
+        .order_by("timestamp")
+        .values_list("timestamp", flat=True)
+        .first()
+    )
+    if oldest is None:
+        return 0
+
+    archived = 0
+    month = _month_start(oldest)
+    while month < cutoff:
+        archived += archive_month(month, cutoff)
+        month = _next_month(month)
+
+    return archived
+
+
+def iter_archive_file(archive):
+    """
+    Yield unsaved ActivityLog instances from one archive file, in file order
+    """
+    path = os.path.join(settings.ACTIVITY_LOG_ARCHIVE_DIR, archive.path)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            yield ActivityLog(
+                activity_id=uuid.UUID(row["activity_id"]),
+                user_id=row["user_id"],
+                action=row["action"],
+                metadata=row["metadata"],
+                timestamp=datetime.fromisoformat(row["timestamp"]),
+            )
+
+
+def _log_key(log):
+    return log.timestamp, log.activity_id
+
+
+def get_archived_page(
+    limit, start=None, end=None, before=None, after=None, user_id=None, action=None
+):
+    """
+    Return the `limit` newest archived activity logs in the [start, end) range,
+    newest first, optionally only those of one user or action. `before` and
+    `after` are (timestamp, activity_id) keys the logs must be below and above.
+
+    Files are picked by their index rows, newest first, and files outside the
+    range or older than the page already found are never opened. A file is read
+    in one pass keeping at most `limit` logs, so memory does not grow with the
+    archive and later pages cost no more than the first.
+    """
+    archives = ActivityLogArchive.objects.order_by("-last_timestamp")
+    if start is not None:
+        archives = archives.filter(last_timestamp__gte=start)
+    if after is not None:
+        archives = archives.filter(last_timestamp__gte=after[0])
+    if end is not None:
+        archives = archives.filter(first_timestamp__lt=end)
+    if before is not None:
+        archives = archives.filter(first_timestamp__lte=before[0])
+
+    def matches(log):
+        key = _log_key(log)
+        return (
+            (start is None or log.timestamp >= start)
+            and (end is None or log.timestamp < end)
+            and (before is None or key < before)
+            and (after is None or key > after)
+            and (user_id is None or log.user_id == user_id)
+            and (not action or log.action == action)
+        )
+
+    page = []
+    for archive in archives:
+        if len(page) == limit and archive.last_timestamp < page[-1].timestamp:
+            # This file and every following one only hold older logs
+            break
+        page = heapq.nlargest(
+            limit,
+            chain(page, filter(matches, iter_archive_file(archive))),
+            key=_log_key,
+        )
+
+    return page
@@ -0,0 +1,108 @@
+import logging
+
+from django.utils import timezone
+
+from utils import metrics
+from utils.logger import ActivityLogger
+
+from .analyzers import get_analyzer
+from .choices import StatusChoice
+from .compression import compression_of
+from .models import FileUpload, WordCountResult
+
+logger = logging.getLogger(__name__)
+
+HITS_COUNTER = "word_count_cache.hits"
+MISSES_COUNTER = "word_count_cache.misses"
+
+
+def store_word_count(content_hash, analyzer, word_count):
+    """
+    Remember the word count of some content for later duplicate uploads
+    """
+    try:
+        WordCountResult.objects.get_or_create(
+            content_hash=content_hash,
+            analyzer=analyzer.key,
+            defaults={"word_count": word_count},
+        )
+    except Exception as e:
+        logger.error(f"Failed to store word count result=> {e}", exc_info=True)
+
+
+def complete_from_cache(file_upload):
+    """
+    Save the content hash of a new upload and, when identical content was already
+    counted, complete it with the stored word count.
+    Returns True when no counting work is needed.
+    """
+    return not complete_many_from_cache([file_upload])
+
+
+def complete_many_from_cache(file_uploads):
+    """
+    Save the content hashes of new uploads of one user and complete the ones whose
+    content was already counted, with one lookup query and one UPDATE.
+    Returns the uploads that still need to be counted.
+    """
+    analyzer_keys = {}
+    for file_upload in file_uploads:
+        compression = compression_of(file_upload.file.name)
+        analyzer = get_analyzer(
+            file_upload.filename, None if compression else file_upload.file.path
+        )
+        if analyzer is not None and file_upload.content_hash:
+            analyzer_keys[file_upload.file_id] = analyzer.key
+
+    results = {}
+    if analyzer_keys:
+        results = {
+            (content_hash, analyzer): word_count
+            for content_hash, analyzer, word_count in WordCountResult.objects.filter(
+                content_hash__in={f.content_hash for f in file_uploads},
+                analyzer__in=set(analyzer_keys.values()),
+            ).values_list("content_hash", "analyzer", "word_count")
+        }
+
+    now = timezone.now()
+    pending, completed = [], []
+    for file_upload in file_uploads:
+        key = (file_upload.content_hash, analyzer_keys.get(file_upload.file_id))
+        if key not in results:
+            pending.append(file_upload)
+            continue
+
+        file_upload.word_count = results[key]
+        file_upload.status = StatusChoice.COMPLETED
+        file_upload.updated_at = now
+        completed.append(file_upload)
+
+    if completed:
+        metrics.increment(HITS_COUNTER, len(completed))
+    if len(analyzer_keys) > len(completed):
+        metrics.increment(MISSES_COUNTER, len(analyzer_keys) - len(completed))
+
+    FileUpload.objects.bulk_update(
+        file_uploads, ["content_hash", "word_count", "status", "updated_at"]
+    )
+
+    if completed:
+        ActivityLogger.log_word_counts(
+            completed[0].user,
+            [(f.filename.lower(), f.word_count, "COMPLETED") for f in completed],
+        )
+
+    return pending
+
+
+def get_cache_stats():
+    counters = metrics.get_counters([HITS_COUNTER, MISSES_COUNTER])
+    hits, misses = counters[HITS_COUNTER], counters[MISSES_COUNTER]
+    lookups = hits + misses
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "stored_results": WordCountResult.objects.count(),
+    }
@@ -3,4 +3,8 @@ from django.db import models
 class StatusChoice(models.TextChoices):
         PROCESSING = "Processing", "Processing"
         COMPLETED = "Completed", "Completed"
-        FAILED = "Failed", "Failed"
\ No newline at end of file
+        FAILED = "Failed", "Failed"
+
+class UploadSessionStatusChoice(models.TextChoices):
+        OPEN = "Open", "Open"
+        COMPLETED = "Completed", "Completed"
@@ -0,0 +1,200 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .choices import UploadSessionStatusChoice
+from .compression import get_compression
+from .models import FileUpload, UploadChunk, UploadSession
+from .storage import (
+    SESSION_FILE_SUFFIX,
+    acquire_blobs,
+    get_upload_directory,
+    get_upload_storage,
+)
+
+# Bytes read from the request or the assembled file at a time
+READ_SIZE = 64 * 1024
+
+
+def session_expiry():
+    return timezone.now() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+
+def session_path(session):
+    """
+    Path of the file a session's chunks are written into, in the storage's temporary directory
+    """
+    return get_upload_storage().temp_path(
+        f"{session.session_id.hex}{SESSION_FILE_SUFFIX}"
+    )
+
+
+def chunk_count(session):
+    return -(-session.size // session.chunk_size)
+
+
+def chunk_length(session, index):
+    """
+    Size of chunk `index`: the chunk size, except for a shorter last chunk
+    """
+    return min(session.chunk_size, session.size - index * session.chunk_size)
+
+
+def open_session(user, filename, size):
+    """
+    Start a resumable upload. The session file is created at its full size, sparse
+    where the file system allows it, so chunks can be written in any order.
+    """
+    session = UploadSession.objects.create(
+        user=user,
+        filename=filename,
+        size=size,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        expires_at=session_expiry(),
+    )
+    with open(session_path(session), "xb") as f:
+        f.truncate(size)
+
+    return session
+
+
+class UploadSessionClosed(Exception):
+    """
+    Raised when a chunk arrives for a session that was finalized or deleted meanwhile
+    """
+
+
+def write_chunk(session, index, stream, length):
+    """
+    Copy `length` bytes of `stream` to the place of chunk `index` in the session file,
+    without holding more than READ_SIZE bytes in memory. Writing a chunk again
+    overwrites it. Returns the number of bytes received, the chunk is only recorded
+    when they are all there and the session is still open.
+    """
+    received = 0
+    try:
+        f = open(session_path(session), "r+b")
+    except FileNotFoundError:
+        # Finalize or delete removed the session file since the session was read
+        raise UploadSessionClosed() from None
+
+    with f:
+        f.seek(index * session.chunk_size)
+        while received < length:
+            data = stream.read(min(READ_SIZE, length - received))
+            if not data:
+                break
+            f.write(data)
+            received += len(data)
+
+    if received == length:
+        with transaction.atomic():
+            if not (
+                UploadSession.objects.select_for_update()
+                .filter(pk=session.pk, status=UploadSessionStatusChoice.OPEN)
+                .exists()
+            ):
+                raise UploadSessionClosed()
+            UploadChunk.objects.update_or_create(
+                session=session, index=index, defaults={"size": length}
+            )
+            # Every chunk received keeps the session alive for another TTL
+            UploadSession.objects.filter(pk=session.pk).update(
+                expires_at=session_expiry()
+            )
+
+    return received
+
+
+def count_open_sessions(user):
+    return UploadSession.objects.filter(
+        user=user,
+        status=UploadSessionStatusChoice.OPEN,
+        expires_at__gte=timezone.now(),
+    ).count()
+
+
+def received_chunks(session):
+    return list(session.chunks.order_by("index").values_list("index", flat=True))
+
+
+def missing_chunks(session):
+    received = set(received_chunks(session))
+    return [index for index in range(chunk_count(session)) if index not in received]
+
+
+def import_session_file(session):
+    """
+    Store a fully received session file under its content address. Returns the
+    storage name and the content hash.
+
+    Runs before the transaction completing the session, so no lock is held while
+    a large file is read. The file is copied, or compressed, in the same pass that
+    hashes it rather than linked, so a chunk written again meanwhile can not change
+    the stored blob or make it disagree with its hash. The blob is unreferenced
+    until complete_session acquires it, and collected later if that never happens.
+    """
+    return get_upload_storage().import_file(
+        session_path(session),
+        get_upload_directory(),
+        get_compression(session.filename),
+        link=False,
+    )
+
+
+def complete_session(session, stored_name, content_hash):
+    """
+    Create the FileUpload of an imported session file and mark the session completed.
+    Must run in the transaction that locked the session, the session file is
+    removed once it commits.
+    """
+    file_upload = FileUpload.objects.create(
+        user=session.user,
+        file=stored_name,
+        filename=session.filename,
+        size=session.size,
+        content_hash=content_hash,
+    )
+    acquire_blobs([file_upload.file.name])
+
+    session.status = UploadSessionStatusChoice.COMPLETED
+    session.file_upload = file_upload
+    session.save(update_fields=["status", "file_upload"])
+    transaction.on_commit(lambda: remove_session_file(session))
+
+    return file_upload
+
+
+def remove_session_file(session):
+    try:
+        os.remove(session_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def delete_session(session):
+    # Deleting clears the primary key the session file is named after
+    remove_session_file(session)
+    session.delete()
+
+
+def expire_upload_sessions():
+    """
+    Delete open sessions past their expiry with their session files. Completed
+    sessions are kept, so finalizing again still returns their upload.
+    Returns the number of deleted sessions.
+    """
+    deleted = 0
+    expired = UploadSession.objects.filter(
+        status=UploadSessionStatusChoice.OPEN, expires_at__lt=timezone.now()
+    )
+    for session in expired.only("session_id"):
+        # Skip sessions a chunk extended or finalize completed since they were listed
+        if expired.filter(pk=session.pk, expires_at__lt=timezone.now()).delete()[0]:
+            remove_session_file(session)
+            deleted += 1
+
+    return deleted
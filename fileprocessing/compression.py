@@ -0,0 +1,84 @@
+import gzip
+import logging
+import os
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:
+    # zstd compression needs the optional zstandard package, gzip is used without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# Suffix added to the storage name of blobs compressed with each codec
+SUFFIXES = {GZIP: ".gz", ZSTD: ".zst"}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def get_compression(filename):
+    """
+    Return the codec UPLOAD_COMPRESSION picks for a file by its extension, or None
+    to store it as is. zstd falls back to gzip when zstandard is not installed.
+    """
+    extension = os.path.splitext(filename.lower())[1]
+    codecs = {key.lower(): value for key, value in settings.UPLOAD_COMPRESSION.items()}
+    codec = codecs.get(extension)
+    if not codec:
+        return None
+
+    if codec == ZSTD and zstandard is None:
+        logger.warning("zstandard is not installed, compressing with gzip instead")
+        return GZIP
+    if codec not in SUFFIXES:
+        logger.error(
+            f"Unknown upload compression {codec} for {extension}, stored as is"
+        )
+        return None
+
+    return codec
+
+
+def compression_of(name):
+    """
+    Return the codec a blob was stored with, from the suffix of its storage name
+    """
+    for codec, suffix in SUFFIXES.items():
+        if name.endswith(suffix):
+            return codec
+
+    return None
+
+
+def open_writer(f, codec):
+    """
+    Wrap a binary file open for writing so what is written is compressed with
+    `codec`. Closing the writer finishes the stream but leaves `f` open.
+    """
+    if codec is None:
+        return f
+    if codec == GZIP:
+        # A fixed mtime keeps the compressed bytes a function of the content only
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f, closefd=False)
+
+
+def open_reader(path, codec):
+    """
+    Open a blob for reading its original content, decompressing it as it is read
+    """
+    if codec is None:
+        return open(path, "rb")
+    if codec == GZIP:
+        return gzip.open(path, "rb")
+    if zstandard is None:
+        raise RuntimeError(f"zstandard must be installed to read {path}")
+
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
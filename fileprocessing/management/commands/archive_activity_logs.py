@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from fileprocessing.archive import archive_activity_logs, get_archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move activity logs older than the retention window to monthly archive files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Archive logs older than this many days instead of the configured retention",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["days"])
+        else:
+            cutoff = get_archive_cutoff()
+
+        archived = archive_activity_logs(cutoff)
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {archived} activity logs older than {cutoff}")
+        )
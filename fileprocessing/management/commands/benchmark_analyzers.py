@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fileprocessing.analyzers import get_analyzer, get_registered_analyzers
+
+
+class Command(BaseCommand):
+    help = "Benchmark word count analyzers against sample files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="Sample files to analyze")
+        parser.add_argument(
+            "--analyzer",
+            help="Analyzer name to use for every file instead of looking it up",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per file, best is reported"
+        )
+
+    def handle(self, *args, **options):
+        analyzers = get_registered_analyzers()
+        if options["analyzer"] and options["analyzer"] not in analyzers:
+            raise CommandError(
+                f"Unknown analyzer {options['analyzer']}, "
+                f"choose from {', '.join(sorted(analyzers))}"
+            )
+
+        for file_path in options["files"]:
+            if options["analyzer"]:
+                analyzer = analyzers[options["analyzer"]]
+            else:
+                analyzer = get_analyzer(os.path.basename(file_path), file_path)
+
+            if analyzer is None:
+                self.stderr.write(f"{file_path}: no analyzer registered")
+                continue
+
+            size = os.path.getsize(file_path)
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                word_count = analyzer.count(file_path)
+                timings.append(time.perf_counter() - started)
+
+            best = min(timings)
+            throughput = size / best / 2**20 if best else float("inf")
+            self.stdout.write(
+                f"{file_path}: analyzer={analyzer.key} words={word_count} "
+                f"best={best:.3f}s throughput={throughput:.1f} MiB/s"
+            )
@@ -0,0 +1,140 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from fileprocessing.models import ActivityLog, FileUpload
+from fileprocessing.serializers import ActivityLogSerializer, FileUploadSerializer
+from payment.models import PaymentTransaction
+from payment.serializers import PaymentTransactionSerializer
+from user.models import CustomUser
+from utils.listing import RowEncoder
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark listing rows with ModelSerializer instances against values() "
+        "rows and the RowEncoder. Everything created is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=20000, help="Rows to create per table"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per case, best is reported"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]):
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        user = CustomUser.objects.create_user(
+            username=f"benchmark_{uuid.uuid4().hex[:8]}",
+            password=None,
+            email="benchmark@example.com",
+            mobile_number="0",
+        )
+        self.create_rows(user, options["rows"])
+        context = {"request": Request(APIRequestFactory().get("/"))}
+
+        cases = [
+            ("files", FileUpload, FileUploadSerializer, None),
+            ("activity", ActivityLog, ActivityLogSerializer, None),
+            (
+                "transactions",
+                PaymentTransaction,
+                PaymentTransactionSerializer,
+                [
+                    "payment_id",
+                    "user",
+                    "amount",
+                    "status",
+                    "transaction_id",
+                    "timestamp",
+                ],
+            ),
+        ]
+        for name, model, serializer_class, fields in cases:
+            queryset = model.objects.filter(user=user).order_by("-pk")
+
+            def serialize():
+                return serializer_class(
+                    queryset.select_related("user"), many=True, context=context
+                ).data
+
+            encoder = RowEncoder(serializer_class, fields=fields, context=context)
+
+            def encode():
+                return encoder.encode(queryset.values(*encoder.columns))
+
+            if fields is None:
+                assert [dict(row) for row in serialize()] == encode()
+            serializer_time = self.best(serialize, options["repeat"])
+            encoder_time = self.best(encode, options["repeat"])
+            self.stdout.write(
+                f"{name}: serializer={options['rows'] / serializer_time:.0f} rows/s "
+                f"encoder={options['rows'] / encoder_time:.0f} rows/s "
+                f"speedup={serializer_time / encoder_time:.1f}x"
+            )
+
+    def best(self, fetch, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fetch()
+            timings.append(time.perf_counter() - started)
+
+        return min(timings)
+
+    def create_rows(self, user, count):
+        now = timezone.now()
+        for offset in range(0, count, BATCH_SIZE):
+            rows = range(offset, min(offset + BATCH_SIZE, count))
+            FileUpload.objects.bulk_create(
+                [
+                    FileUpload(
+                        user=user,
+                        file=f"uploads/benchmark_{row}.txt",
+                        filename=f"benchmark_{row}.txt",
+                        word_count=row,
+                        upload_time=now - timedelta(seconds=row),
+                    )
+                    for row in rows
+                ]
+            )
+            ActivityLog.objects.bulk_create(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="benchmark",
+                        metadata={"row": row},
+                        timestamp=now - timedelta(seconds=row),
+                    )
+                    for row in rows
+                ]
+            )
+            PaymentTransaction.objects.bulk_create(
+                [
+                    PaymentTransaction(
+                        user=user,
+                        transaction_id=f"benchmark_{uuid.uuid4().hex}",
+                        gateway_response={
+                            "pay_status": "Successful",
+                            "row": row,
+                            "details": ["x" * 40] * 20,
+                        },
+                    )
+                    for row in rows
+                ]
+            )
@@ -0,0 +1,109 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from fileprocessing.models import ActivityLog
+from user.models import CustomUser
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark offset against keyset pagination of activity logs at growing "
+        "page depths. Everything created is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1000000, help="Activity logs to create"
+        )
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--pages",
+            type=int,
+            nargs="+",
+            default=[1, 100, 1000, 10000],
+            help="Page numbers to fetch",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per page, best is reported"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        user = CustomUser.objects.create_user(
+            username=f"benchmark_{uuid.uuid4().hex[:8]}",
+            password=None,
+            email="benchmark@example.com",
+            mobile_number="0",
+        )
+        self.create_logs(user, options["rows"])
+
+        page_size = options["page_size"]
+        ordered = ActivityLog.objects.order_by("-timestamp", "-pk")
+
+        for page in sorted(options["pages"]):
+            offset = (page - 1) * page_size
+            if offset >= options["rows"]:
+                continue
+
+            def fetch_offset():
+                return list(ordered[offset : offset + page_size])
+
+            # The cursor a client would hold is the last row of the previous page
+            cursor = (
+                ordered.values_list("timestamp", "pk")[offset - 1] if offset else None
+            )
+
+            def fetch_keyset():
+                qs = ordered
+                if cursor is not None:
+                    value, pk = cursor
+                    qs = qs.filter(
+                        Q(timestamp__lte=value), Q(timestamp__lt=value) | Q(pk__lt=pk)
+                    )
+                return list(qs[:page_size])
+
+            assert fetch_offset() == fetch_keyset()
+            offset_time = self.best(fetch_offset, options["repeat"])
+            keyset_time = self.best(fetch_keyset, options["repeat"])
+            self.stdout.write(
+                f"page={page} offset={offset_time * 1000:.2f}ms "
+                f"keyset={keyset_time * 1000:.2f}ms "
+                f"speedup={offset_time / keyset_time:.1f}x"
+            )
+
+    def best(self, fetch, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fetch()
+            timings.append(time.perf_counter() - started)
+
+        return min(timings)
+
+    def create_logs(self, user, count):
+        now = timezone.now()
+        for offset in range(0, count, BATCH_SIZE):
+            ActivityLog.objects.bulk_create(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="benchmark",
+                        metadata={"row": row},
+                        # Whole seconds so that some rows share a timestamp
+                        timestamp=now - timedelta(seconds=row // 3),
+                    )
+                    for row in range(offset, min(offset + BATCH_SIZE, count))
+                ]
+            )
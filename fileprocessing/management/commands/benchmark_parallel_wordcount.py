@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from fileprocessing.parallel import count_words_in_ranges, split_byte_ranges
+
+
+class Command(BaseCommand):
+    help = "Benchmark parallel byte range word counting of a large text file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Large text file to count")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[1, 2, 4, os.cpu_count() or 4],
+            help="Process pool sizes to compare",
+        )
+
+    def handle(self, *args, **options):
+        file_path = options["file"]
+        size = os.path.getsize(file_path)
+        baseline = None
+
+        for workers in sorted(set(options["workers"])):
+            started = time.perf_counter()
+            ranges = split_byte_ranges(file_path, workers)
+            word_count = count_words_in_ranges(file_path, ranges, workers)
+            elapsed = time.perf_counter() - started
+
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f"workers={workers} ranges={len(ranges)} words={word_count} "
+                f"time={elapsed:.3f}s throughput={size / elapsed / 2**20:.1f} MiB/s "
+                f"speedup={baseline / elapsed:.2f}x"
+            )
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from fileprocessing.storage import collect_unused_blobs
+
+
+class Command(BaseCommand):
+    help = "Delete stored upload blobs that no upload references any more"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=settings.UPLOAD_BLOB_GRACE_HOURS,
+            help="Only delete blobs unreferenced for at least this many hours",
+        )
+
+    def handle(self, *args, **options):
+        deleted = collect_unused_blobs(timedelta(hours=options["grace_hours"]))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unused blobs"))
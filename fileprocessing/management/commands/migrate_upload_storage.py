@@ -0,0 +1,65 @@
+import os
+import posixpath
+
+from django.core.management.base import BaseCommand
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+
+from fileprocessing.models import FileUpload
+from fileprocessing.compression import get_compression
+from fileprocessing.storage import (
+    BLOB_NAME_RE,
+    get_upload_storage,
+    rebuild_blob_refs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move uploads stored under their original names to content addressed blobs, "
+        "then rebuild the blob reference counts. Safe to run again after a failure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = get_upload_storage()
+        legacy = FileUpload.objects.exclude(file__regex=BLOB_NAME_RE.pattern).order_by(
+            "pk"
+        )
+
+        moved = missing = 0
+        last_pk = None
+        while True:
+            batch = legacy if last_pk is None else legacy.filter(pk__gt=last_pk)
+            batch = list(batch.values_list("pk", "file")[: options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            for pk, name in batch:
+                path = storage.path(name)
+                if not os.path.exists(path):
+                    self.stderr.write(f"Missing file {name} of upload {pk}, skipped")
+                    missing += 1
+                    continue
+
+                blob, content_hash = storage.import_file(
+                    path, posixpath.dirname(name), get_compression(name)
+                )
+
+                FileUpload.objects.filter(pk=pk).update(
+                    file=blob,
+                    content_hash=Coalesce("content_hash", Value(content_hash)),
+                )
+                if not FileUpload.objects.filter(file=name).exists():
+                    storage.delete(name)
+                moved += 1
+
+        blobs = rebuild_blob_refs()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Moved {moved} uploads to {blobs} blobs, {missing} files missing"
+            )
+        )
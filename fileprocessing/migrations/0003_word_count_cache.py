@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fileprocessing', '0002_activitylog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='WordCountResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('analyzer', models.CharField(max_length=100)),
+                ('word_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_hash', 'analyzer'), name='unique_word_count_result')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fileprocessing', '0007_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['action', 'timestamp', 'activity_id'], name='activity_log_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fileupload',
+            index=models.Index(fields=['status', 'upload_time', 'file_id'], name='file_upload_status_idx'),
+        ),
+    ]
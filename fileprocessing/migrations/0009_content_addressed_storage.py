@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:01
+
+import fileprocessing.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fileprocessing', '0008_listing_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fileupload',
+            name='file',
+            field=models.FileField(db_index=True, storage=fileprocessing.storage.get_upload_storage, upload_to='uploads/'),
+        ),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='filename',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='stored_blob_unused_idx')],
+            },
+        ),
+    ]
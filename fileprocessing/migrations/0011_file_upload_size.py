@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fileprocessing', '0010_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
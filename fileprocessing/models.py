@@ -1,16 +1,28 @@
 from django.db import models
+from django.utils import timezone
 from user.models import CustomUser
-from .choices import StatusChoice
+from .choices import StatusChoice, UploadSessionStatusChoice
+from .storage import get_upload_storage
 import uuid
 
 class FileUpload(models.Model):
     file_id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="file_uploads")
-    file = models.FileField(upload_to='uploads/')
-    filename = models.CharField(max_length=100)
+    file = models.FileField(upload_to='uploads/', storage=get_upload_storage, db_index=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(blank=True, null=True)
     upload_time = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=15, choices=StatusChoice.choices, default=StatusChoice.PROCESSING)
     word_count = models.PositiveIntegerField(blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['upload_time', 'file_id'], name='file_upload_keyset_idx'),
+            models.Index(fields=['user', 'upload_time', 'file_id'], name='file_upload_user_keyset_idx'),
+            models.Index(fields=['status', 'upload_time', 'file_id'], name='file_upload_status_idx'),
+        ]
 
     def __str__(self):
         return f"file id is = {self.file_id}, uploaded by {self.user.username}"
@@ -20,8 +32,87 @@ class ActivityLog(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="activity_logs")
     action = models.CharField(max_length=50)
     metadata = models.JSONField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'activity_id'], name='activity_log_keyset_idx'),
+            models.Index(fields=['user', 'timestamp', 'activity_id'], name='activity_log_user_keyset_idx'),
+            models.Index(fields=['action', 'timestamp', 'activity_id'], name='activity_log_action_idx'),
+        ]
 
     def __str__(self):
         return f"Activity id: {self.activity_id}, user: {self.user.username}"
 
+class WordCountResult(models.Model):
+    content_hash = models.CharField(max_length=64)
+    analyzer = models.CharField(max_length=100)
+    word_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_hash", "analyzer"], name="unique_word_count_result")
+        ]
+
+    def __str__(self):
+        return f"{self.analyzer} result for {self.content_hash}: {self.word_count}"
+
+class ActivityLogArchive(models.Model):
+    month = models.DateField()
+    path = models.CharField(max_length=255)
+    row_count = models.PositiveIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['first_timestamp', 'last_timestamp'], name='activity_archive_range_idx')]
+
+    def __str__(self):
+        return f"{self.row_count} activity logs of {self.month:%Y-%m} in {self.path}"
+
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)
+    content_hash = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['ref_count', 'updated_at'], name='stored_blob_unused_idx')]
+
+    def __str__(self):
+        return f"{self.name} referenced by {self.ref_count} uploads"
+
+class UploadSession(models.Model):
+    session_id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=15, choices=UploadSessionStatusChoice.choices, default=UploadSessionStatusChoice.OPEN)
+    file_upload = models.OneToOneField(FileUpload, on_delete=models.SET_NULL, blank=True, null=True, related_name="upload_session")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'expires_at'], name='upload_session_expiry_idx')]
+
+    def __str__(self):
+        return f"upload session {self.session_id} for {self.filename}"
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "index"], name="unique_upload_chunk")
+        ]
+
+    def __str__(self):
+        return f"chunk {self.index} of upload session {self.session_id}"
\ No newline at end of file
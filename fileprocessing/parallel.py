@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from .wordcount import CHUNK_SIZE, WHITESPACE_BYTE_RE, count_words_in_mapped_file
+
+
+def _next_split_offset(f, offset, size):
+    """
+    Return the offset just after the first whitespace byte at or after `offset`
+    """
+    f.seek(offset)
+    while offset < size:
+        block = f.read(CHUNK_SIZE)
+        if not block:
+            break
+
+        match = WHITESPACE_BYTE_RE.search(block)
+        if match:
+            return offset + match.end()
+
+        offset += len(block)
+
+    return size
+
+
+def split_byte_ranges(file_path, parts):
+    """
+    Split a text file into at most `parts` contiguous (start, end) byte ranges of
+    roughly equal size, each ending just after an ASCII whitespace byte.
+    Those bytes never occur inside a multi-byte UTF-8 sequence and always separate
+    words, so ranges decode and count independently.
+    """
+    size = os.path.getsize(file_path)
+    step = -(-size // max(parts, 1))
+    boundaries = [0]
+
+    with open(file_path, "rb") as f:
+        for part in range(1, parts):
+            offset = _next_split_offset(f, max(part * step, boundaries[-1]), size)
+            if offset >= size:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def count_words_in_range(file_path, start, end, encoding="utf-8"):
+    """
+    Count words in the [start, end) byte range of a text file
+    """
+    return count_words_in_mapped_file(file_path, start, end, encoding)
+
+
+def count_words_in_ranges(file_path, ranges, workers=None):
+    """
+    Count words of every byte range in a process pool and return the total.
+
+    Celery prefork workers are daemonic processes and cannot start a pool, so
+    this is only usable from the threads/solo worker pools or outside Celery.
+    Whether it beats a single pass depends on the machine, measure it with the
+    benchmark_parallel_wordcount command.
+    """
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(count_words_in_range, repeat(file_path), starts, ends))
@@ -1,19 +1,69 @@
 import logging
 
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 
-from .models import ActivityLog, FileUpload
+from .chunked import chunk_count, open_session, received_chunks
+from .models import ActivityLog, FileUpload, UploadSession
+from .storage import acquire_blobs
+from .uploads import StoredUploadedFile, get_file_type_error
 
 logger = logging.getLogger(__name__)
 
 
+def stored_upload_fields(file, validated_data):
+    """
+    Model fields of an upload the streaming upload handler already stored
+    """
+    return {
+        **validated_data,
+        "file": file.stored_name,
+        "filename": file.name,
+        "size": file.size,
+        "content_hash": file.content_hash,
+        "word_count": file.word_count,
+    }
+
+
+def validate_stored_file(file):
+    """
+    Refuse files that were not received by StreamingUploadHandler, which hashes
+    and stores every upload before the serializer sees it
+    """
+    if not isinstance(file, StoredUploadedFile):
+        raise serializers.ValidationError("The file was not stored while uploading")
+    return file
+
+
+class FileDownloadURLField(serializers.Field):
+    """
+    URL of the authenticated download view of an upload, from its file_id.
+    Stored names are content hashes without an extension, so the storage URL is
+    never exposed.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        kwargs.setdefault("source", "file_id")
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        url = reverse("file-download", args=[value])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
 class FileUploadSerializer(serializers.ModelSerializer):
+    download_url = FileDownloadURLField()
+
     class Meta:
         model = FileUpload
         fields = [
             "file_id",
             "user",
             "file",
+            "download_url",
             "filename",
             "upload_time",
             "status",
@@ -23,23 +73,110 @@ class FileUploadSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "file_id": {"read_only": True},
             "user": {"read_only": True},
+            "file": {"write_only": True},
             "filename": {"read_only": True},
             "upload_time": {"read_only": True},
             "status": {"read_only": True},
             "word_count": {"read_only": True},
         }
 
+    def validate_file(self, value):
+        return validate_stored_file(value)
+
     def create(self, validated_data):
         try:
-            file = validated_data.get("file")
-            validated_data["filename"] = file.name
-            return super().create(validated_data)
+            instance = super().create(
+                stored_upload_fields(validated_data["file"], validated_data)
+            )
+            acquire_blobs([instance.file.name])
+            return instance
         except Exception as e:
             logger.error(f"Error creating file upload instance=> {e}", exc_info=True)
             raise
 
 
+class BatchFileUploadSerializer(serializers.Serializer):
+    files = serializers.ListField(
+        child=serializers.FileField(),
+        allow_empty=False,
+        max_length=settings.FILE_UPLOAD_BATCH_MAX_FILES,
+    )
+
+    def validate_files(self, value):
+        return [validate_stored_file(file) for file in value]
+
+    def create(self, validated_data):
+        try:
+            user = validated_data["user"]
+            file_uploads = FileUpload.objects.bulk_create(
+                [
+                    FileUpload(**stored_upload_fields(file, {"user": user}))
+                    for file in validated_data["files"]
+                ]
+            )
+            acquire_blobs([file_upload.file.name for file_upload in file_uploads])
+            return file_uploads
+        except Exception as e:
+            logger.error(f"Error creating file upload instances=> {e}", exc_info=True)
+            raise
+
+
 class ActivityLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = ActivityLog
         fields = ["activity_id", "user", "action", "metadata", "timestamp"]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_count = serializers.SerializerMethodField()
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "session_id",
+            "filename",
+            "size",
+            "chunk_size",
+            "chunk_count",
+            "received_chunks",
+            "status",
+            "file_upload",
+            "created_at",
+            "expires_at",
+        ]
+
+        extra_kwargs = {
+            "session_id": {"read_only": True},
+            "chunk_size": {"read_only": True},
+            "status": {"read_only": True},
+            "file_upload": {"read_only": True},
+            "created_at": {"read_only": True},
+            "expires_at": {"read_only": True},
+        }
+
+    def create(self, validated_data):
+        return open_session(
+            validated_data["user"], validated_data["filename"], validated_data["size"]
+        )
+
+    def get_chunk_count(self, obj):
+        return chunk_count(obj)
+
+    def get_received_chunks(self, obj):
+        return received_chunks(obj)
+
+    def validate_filename(self, value):
+        file_type_error = get_file_type_error(value)
+        if file_type_error:
+            raise serializers.ValidationError(file_type_error)
+        return value
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("The file is empty")
+        if value > settings.FILE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File is larger than {settings.FILE_UPLOAD_MAX_SIZE} bytes"
+            )
+        return value
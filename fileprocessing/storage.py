@@ -0,0 +1,288 @@
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .compression import (
+    SUFFIXES,
+    compression_of,
+    get_compression,
+    open_reader,
+    open_writer,
+)
+
+logger = logging.getLogger(__name__)
+
+TEMP_DIR = "tmp"
+SESSION_FILE_SUFFIX = ".part"
+BLOB_NAME_RE = re.compile(
+    r"^(?:.*/)?[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:%s)?$"
+    % "|".join(re.escape(suffix) for suffix in SUFFIXES.values())
+)
+# Bytes read at a time when copying a file into storage
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(directory, content_hash, compression=None):
+    """
+    Storage name of some content: sharded by the first two bytes of its SHA-256
+    so no directory grows past 65536 entries per level. Compressed blobs get the
+    suffix of their codec.
+    """
+    name = posixpath.join(directory, content_hash[:2], content_hash[2:4], content_hash)
+    return name + SUFFIXES[compression] if compression else name
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping each distinct content once, at
+    `<upload_to>/ab/cd/<sha256>`, whatever name it was uploaded with.
+
+    Files are written to a temporary name first and moved into place once their
+    hash is known. Content that is already stored is not written again.
+    File types listed in UPLOAD_COMPRESSION are compressed as they are written,
+    the hash is always the one of the original content.
+    Every blob has a StoredBlob row counting the uploads that reference it, so
+    unreferenced blobs can be collected.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content, identical names mean identical files
+        return name
+
+    def temp_path(self, name=None):
+        path = self.path(posixpath.join(TEMP_DIR, name or uuid.uuid4().hex))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _save(self, name, content):
+        compression = get_compression(name)
+        temp_path, content_hash = self.write_temp(content.chunks(), compression)
+
+        return self.store_blob(
+            temp_path, posixpath.dirname(name), content_hash, compression
+        )
+
+    def write_temp(self, chunks, compression=None):
+        """
+        Write chunks to a new temporary file, compressed with `compression`.
+        Returns its path and the SHA-256 of the chunks.
+        """
+        temp_path = self.temp_path()
+        sha256 = hashlib.sha256()
+        try:
+            with open(temp_path, "xb") as f:
+                writer = open_writer(f, compression)
+                for chunk in chunks:
+                    writer.write(chunk)
+                    sha256.update(chunk)
+                writer.close()
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        return temp_path, sha256.hexdigest()
+
+    def store_blob(self, temp_path, directory, content_hash, compression=None):
+        """
+        Move a fully written temporary file to its content address, or drop it when
+        that content is already stored. Returns the storage name.
+        """
+        name = blob_name(directory, content_hash, compression)
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Touch the blob row first: it waits for a collection of this blob to finish,
+        # after which the file is gone and written again below
+        touch_blob(name, content_hash, os.path.getsize(temp_path))
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+
+        return name
+
+    def link_blob(self, source_path, directory, content_hash):
+        """
+        Store an existing file under its content address without copying it when
+        the file system allows hard links. Returns the storage name.
+        """
+        temp_path = self.temp_path()
+        try:
+            os.link(source_path, temp_path)
+        except OSError:
+            shutil.copyfile(source_path, temp_path)
+
+        return self.store_blob(temp_path, directory, content_hash)
+
+    def import_file(self, source_path, directory, compression=None, link=True):
+        """
+        Store an existing file under its content address. Uncompressed files are
+        hashed then linked, compressed ones are hashed while they are compressed.
+        With `link=False` the file is always copied in the pass that hashes it, so
+        later writes to the source can not reach the blob or make it disagree
+        with its hash. Returns the storage name and the content hash.
+        """
+        with open(source_path, "rb") as f:
+            if compression is None and link:
+                content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+                name = self.link_blob(source_path, directory, content_hash)
+            else:
+                temp_path, content_hash = self.write_temp(
+                    iter(lambda: f.read(COPY_CHUNK_SIZE), b""), compression
+                )
+                name = self.store_blob(temp_path, directory, content_hash, compression)
+
+        return name, content_hash
+
+    def open_content(self, name):
+        """
+        Open a blob for reading its original content, through a streaming
+        decompressor when it is stored compressed
+        """
+        return open_reader(self.path(name), compression_of(name))
+
+
+upload_storage = ContentAddressedStorage()
+
+
+def get_upload_storage():
+    return upload_storage
+
+
+def get_upload_directory():
+    """
+    Storage directory of uploads, from the `upload_to` of FileUpload.file
+    """
+    from .models import FileUpload
+
+    field = FileUpload._meta.get_field("file")
+    return posixpath.dirname(field.generate_filename(None, "file"))
+
+
+def touch_blob(name, content_hash, size):
+    """
+    Record that a blob was just stored, so it is not collected within the grace period
+    """
+    from .models import StoredBlob
+
+    while True:
+        if StoredBlob.objects.filter(name=name).update(updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                StoredBlob.objects.create(
+                    name=name, content_hash=content_hash, size=size
+                )
+            return
+        except IntegrityError:
+            # Created concurrently by another upload, touch that row instead
+            continue
+
+
+def acquire_blobs(names):
+    """
+    Count one more reference to each blob, once per name given
+    """
+    from .models import StoredBlob
+
+    counts = {}
+    for name in names:
+        if BLOB_NAME_RE.match(name):
+            counts[name] = counts.get(name, 0) + 1
+
+    for name, count in counts.items():
+        StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") + count)
+
+
+def release_blob(name):
+    """
+    Count one reference less to a blob. The file stays until it is collected.
+    """
+    from .models import StoredBlob
+
+    StoredBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1
+    )
+
+
+def release_deleted_upload_blob(sender, instance, **kwargs):
+    """
+    post_delete receiver releasing the blob of a deleted upload
+    """
+    if instance.file:
+        release_blob(instance.file.name)
+
+
+def collect_unused_blobs(grace=timedelta(hours=24)):
+    """
+    Delete blobs no upload has referenced for `grace`, and temporary files left by
+    interrupted writes. Returns the number of deleted blobs.
+
+    The reference count is checked against the upload table, so a count that
+    drifted low never deletes a file in use.
+    """
+    from .models import FileUpload, StoredBlob
+
+    cutoff = timezone.now() - grace
+    storage = get_upload_storage()
+
+    deleted = 0
+    candidates = StoredBlob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+    for name in list(candidates.values_list("name", flat=True)):
+        with transaction.atomic():
+            blob = (
+                StoredBlob.objects.select_for_update()
+                .filter(name=name, ref_count=0, updated_at__lt=cutoff)
+                .first()
+            )
+            if blob is None:
+                continue
+            if FileUpload.objects.filter(file=name).exists():
+                logger.error(f"Blob {name} is referenced with a zero count, kept")
+                continue
+
+            storage.delete(name)
+            blob.delete()
+            deleted += 1
+
+    temp_dir = storage.path(TEMP_DIR)
+    if os.path.isdir(temp_dir):
+        for entry in os.scandir(temp_dir):
+            if entry.name.endswith(SESSION_FILE_SUFFIX):
+                # Resumable upload sessions are removed when they expire
+                continue
+            modified = datetime.fromtimestamp(entry.stat().st_mtime, tz=dt_timezone.utc)
+            if modified < cutoff:
+                os.remove(entry.path)
+
+    return deleted
+
+
+def rebuild_blob_refs():
+    """
+    Recompute every blob's reference count from the upload table with one UPDATE.
+    Returns the number of blobs.
+    """
+    from .models import FileUpload, StoredBlob
+
+    refs = (
+        FileUpload.objects.filter(file=OuterRef("name"))
+        .values("file")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return StoredBlob.objects.update(ref_count=Coalesce(Subquery(refs), Value(0)))
@@ -1,68 +1,123 @@
 import logging
-import re
+import os
 
-from celery import shared_task
-from docx import Document
+from datetime import timedelta
 
+from celery import chord, shared_task
+from django.conf import settings
+
+from fileprocessing.analyzers import get_analyzer
+from fileprocessing.archive import archive_activity_logs
+from fileprocessing.cache import store_word_count
+from fileprocessing.chunked import expire_upload_sessions
 from fileprocessing.choices import StatusChoice
+from fileprocessing.compression import compression_of
 from fileprocessing.models import FileUpload
+from fileprocessing.parallel import count_words_in_ranges, split_byte_ranges
+from fileprocessing.storage import collect_unused_blobs
 from utils.logger import ActivityLogger
 
 logger = logging.getLogger(__name__)
 
 
-def word_count_from_txt_file(file_path):
+def complete_word_count(file_upload, word_count, analyzer):
     """
-    Count words in a text file
+    Store the final word count of an upload, cache it for duplicates and log it
     """
-    with open(file_path, "r") as f:
-        text = f.read()
-        word_list = re.findall(r"\b[a-zA-Z0-9'-]+\b", text)
+    file_upload.word_count = word_count
+    file_upload.status = StatusChoice.COMPLETED
+    file_upload.save(update_fields=["word_count", "status", "updated_at"])
+
+    if file_upload.content_hash:
+        store_word_count(file_upload.content_hash, analyzer, word_count)
 
-        return len(word_list)
+    ActivityLogger.log_word_count(
+        file_upload.user, file_upload.filename.lower(), word_count, "COMPLETED"
+    )
 
 
-def word_count_from_doc_file(file_path):
+def fail_word_count(file_upload):
     """
-    Count words in a DOCX file
+    Mark an upload as failed and log it
     """
-    doc = Document(file_path)
-    total_count = 0
+    file_upload.status = StatusChoice.FAILED
+    file_upload.save(update_fields=["status", "updated_at"])
+    ActivityLogger.log_word_count(
+        file_upload.user, file_upload.filename.lower(), None, "FAILED"
+    )
+
+
+def use_parallel_mode(analyzer, file_path):
+    """
+    Check whether a file is large enough to be counted in parallel byte ranges
+    """
+    return (
+        analyzer.splittable
+        and os.path.getsize(file_path) >= settings.WORD_COUNT_PARALLEL_THRESHOLD
+    )
+
 
-    for para in doc.paragraphs:
-        word_list = re.findall(r"\b[a-zA-Z0-9'’'-]+\b", para.text)
-        total_count += len(word_list)
+def word_count_options(file_upload):
+    """
+    Queue and priority to count the words of an upload with. Files over
+    WORD_COUNT_SMALL_FILE_MAX_SIZE bytes go to the large file queue, and within a
+    queue smaller files are taken first.
+    """
+    size = file_upload.size if file_upload.size is not None else file_upload.file.size
+    if size <= settings.WORD_COUNT_SMALL_FILE_MAX_SIZE:
+        queue = settings.WORD_COUNT_SMALL_QUEUE
+    else:
+        queue = settings.WORD_COUNT_LARGE_QUEUE
 
-    return total_count
+    # One priority step per fourfold size above 1 KiB: 0 (first) below 4 KiB,
+    # 1 below 16 KiB and so on, up to 9 from 256 MiB
+    priority = min(max((size.bit_length() - 11) // 2, 0), 9)
+    return {"queue": queue, "priority": priority}
 
 
 @shared_task(bind=True)
 def count_words(self, file_id):
     """
-    Celery task to count the number of words in the uploaded file(Only for text and docx file)
+    Celery task to count the number of words in the uploaded file with the analyzer
+    registered for its type. Large splittable files are counted in parallel ranges,
+    compressed files are read through a streaming decompressor.
     """
+    file_upload = None
     try:
         file_upload = FileUpload.objects.get(file_id=file_id)
         file_path = file_upload.file.path
         filename = file_upload.filename.lower()
+        compression = compression_of(file_upload.file.name)
 
-        if filename.endswith(".txt"):
-            word_count = word_count_from_txt_file(file_path)
-        elif filename.endswith(".docx"):
-            word_count = word_count_from_doc_file(file_path)
-        else:
-            file_upload.status = StatusChoice.FAILED
-            file_upload.save(update_fields=["status"])
-            ActivityLogger.log_word_count(file_upload.user, filename, None, "FAILED")
+        # The leading bytes of a compressed file say nothing about its type
+        analyzer = get_analyzer(filename, None if compression else file_path)
+        if analyzer is None:
             raise ValueError(f"Unsupported file type {filename}")
 
-        file_upload.word_count = word_count
-        file_upload.status = StatusChoice.COMPLETED
-        file_upload.save(update_fields=["word_count", "status"])
+        if compression is not None:
+            # Byte ranges of a compressed file can not be mapped, count in one pass
+            with file_upload.file.storage.open_content(file_upload.file.name) as f:
+                word_count = analyzer.count_file(f)
+        elif use_parallel_mode(analyzer, file_path):
+            ranges = split_byte_ranges(file_path, settings.WORD_COUNT_PARALLEL_PARTS)
+
+            if settings.WORD_COUNT_PARALLEL_BACKEND == "process":
+                word_count = count_words_in_ranges(
+                    file_path, ranges, settings.WORD_COUNT_PARALLEL_PARTS
+                )
+            else:
+                header = [
+                    count_words_range.s(file_id, start, end) for start, end in ranges
+                ]
+                callback = finish_word_count.s(file_id).on_error(
+                    fail_parallel_word_count.si(file_id)
+                )
+                chord(header)(callback)
+                return "Dispatched"
+        else:
+            word_count = analyzer.count(file_path)
 
-        ActivityLogger.log_word_count(
-            file_upload.user, filename, word_count, "COMPLETED"
-        )
+        complete_word_count(file_upload, word_count, analyzer)
 
         return "Done"
 
@@ -70,5 +125,82 @@ def count_words(self, file_id):
         logger.error(f"File object not found for file_id: {file_id}", exc_info=True)
         return "Error: File object not found"
     except Exception as e:
-        logger.error(f"Error in count_words: {str(e)}")
+        logger.error(f"Error in count_words: {str(e)}", exc_info=True)
+        # Never leave an upload in Processing when its count can not finish
+        if file_upload is not None and file_upload.status == StatusChoice.PROCESSING:
+            fail_word_count(file_upload)
+        return "Error"
+
+
+@shared_task
+def count_words_range(file_id, start, end):
+    """
+    Celery chord member counting words in one byte range of a large upload
+    """
+    file_upload = FileUpload.objects.get(file_id=file_id)
+    analyzer = get_analyzer(file_upload.filename, file_upload.file.path)
+
+    return analyzer.count_range(file_upload.file.path, start, end)
+
+
+@shared_task
+def finish_word_count(range_counts, file_id):
+    """
+    Celery chord callback adding up the range counts of a large upload
+    """
+    try:
+        file_upload = FileUpload.objects.get(file_id=file_id)
+        analyzer = get_analyzer(file_upload.filename, file_upload.file.path)
+        complete_word_count(file_upload, sum(range_counts), analyzer)
+
+        return "Done"
+    except Exception as e:
+        logger.error(f"Error in finish_word_count: {str(e)}", exc_info=True)
+        return "Error"
+
+
+@shared_task
+def fail_parallel_word_count(file_id):
+    """
+    Celery errback marking an upload failed when counting one of its ranges fails
+    """
+    try:
+        fail_word_count(FileUpload.objects.get(file_id=file_id))
+    except Exception as e:
+        logger.error(f"Error in fail_parallel_word_count: {str(e)}", exc_info=True)
+
+
+@shared_task
+def archive_old_activity_logs():
+    """
+    Celery beat task moving activity logs older than the retention window to the archive
+    """
+    try:
+        return archive_activity_logs()
+    except Exception as e:
+        logger.error(f"Error in archive_old_activity_logs: {str(e)}", exc_info=True)
+        return "Error"
+
+
+@shared_task
+def collect_unused_upload_blobs():
+    """
+    Celery beat task deleting stored upload blobs no upload references any more
+    """
+    try:
+        return collect_unused_blobs(timedelta(hours=settings.UPLOAD_BLOB_GRACE_HOURS))
+    except Exception as e:
+        logger.error(f"Error in collect_unused_upload_blobs: {str(e)}", exc_info=True)
+        return "Error"
+
+
+@shared_task
+def expire_stale_upload_sessions():
+    """
+    Celery beat task deleting resumable upload sessions past their expiry
+    """
+    try:
+        return expire_upload_sessions()
+    except Exception as e:
+        logger.error(f"Error in expire_stale_upload_sessions: {str(e)}", exc_info=True)
         return "Error"
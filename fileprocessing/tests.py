@@ -1,3 +1,631 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from payment.quota import add_upload_credits, get_upload_credits
+from user.models import CustomUser
+
+from .archive import archive_activity_logs
+from .choices import StatusChoice, UploadSessionStatusChoice
+from .chunked import import_session_file, session_path
+from .compression import GZIP, ZSTD, get_compression
+from .models import (
+    ActivityLog,
+    ActivityLogArchive,
+    FileUpload,
+    StoredBlob,
+    UploadSession,
+)
+from .serializers import BatchFileUploadSerializer, FileUploadSerializer
+from .storage import TEMP_DIR, get_upload_storage
+from .tasks import count_words, word_count_options
+from .uploads import StreamingUploadHandler
+from .views import BatchFileUploadAPIView
+from .wordcount import (
+    TXT_WORD_RE,
+    ByteStreamWordCounter,
+    StreamingWordCounter,
+    count_matches,
+    count_words_in_mapped_file,
+)
+
+SAMPLES = [
+    "",
+    "one",
+    "Hello, world! It's a well-known fact.\n",
+    "  leading and trailing spaces  ",
+    "tabs\tand\r\nwindows line endings\n\n",
+    "rock'n'roll -- dash-separated --- words 'quoted' 2024-01-01",
+    "café naïve résumé déjà-vu Straße",
+    "curly ’quotes’ and it’s mixed with it's",
+    "日本語のテキスト mixed with English words",
+    "emoji 🙂 between 👍 words",
+    "averyveryverylongwordwithoutanyseparatorsatall" * 20,
+    "ends without newline",
+]
+
+DOCX_XML = (
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    "<w:body>%s</w:body></w:document>"
+)
+
+
+def create_user(username="uploader"):
+    return CustomUser.objects.create_user(
+        username=username,
+        password="password",
+        email=f"{username}@example.com",
+        mobile_number="01700000000",
+    )
+
+
+def make_docx(*paragraphs):
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", DOCX_XML % body)
+    return buffer.getvalue()
+
+
+class MediaRootMixin:
+    """
+    Store uploads in a temporary MEDIA_ROOT removed after each test
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class StreamingWordCounterTests(SimpleTestCase):
+    def test_every_split_point_matches_single_pass(self):
+        for text in SAMPLES:
+            expected = count_matches(TXT_WORD_RE, text)
+            for cut in range(len(text) + 1):
+                counter = StreamingWordCounter()
+                counter.feed(text[:cut])
+                counter.feed(text[cut:])
+
+                self.assertEqual(counter.close(), expected, (text, cut))
+
+    def test_single_character_chunks_match_single_pass(self):
+        for text in SAMPLES:
+            counter = StreamingWordCounter()
+            for char in text:
+                counter.feed(char)
+
+            self.assertEqual(counter.close(), count_matches(TXT_WORD_RE, text))
+
+
+class ByteStreamWordCounterTests(SimpleTestCase):
+    def write_file(self, data):
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def count_in_chunks(self, data, chunk_size):
+        counter = ByteStreamWordCounter()
+        for offset in range(0, len(data), chunk_size):
+            counter.feed(data[offset : offset + chunk_size])
+        return counter.close()
+
+    def test_chunks_match_mapped_file_counter(self):
+        for text in SAMPLES:
+            data = text.encode("utf-8")
+            path = self.write_file(data)
+            expected = count_words_in_mapped_file(path)
+
+            self.assertEqual(expected, count_matches(TXT_WORD_RE, text))
+            # Small sizes split multi-byte characters and words at every offset
+            for chunk_size in (1, 2, 3, 5, 7, 64):
+                self.assertEqual(
+                    self.count_in_chunks(data, chunk_size),
+                    expected,
+                    (text, chunk_size),
+                )
+
+    def test_invalid_bytes_count_like_mapped_file(self):
+        data = b"valid words \xff\xfe broken \xe2\x82 bytes\nmore caf\xc3\xa9 text"
+        path = self.write_file(data)
+
+        for chunk_size in (1, 2, 3, 4):
+            self.assertEqual(
+                self.count_in_chunks(data, chunk_size),
+                count_words_in_mapped_file(path),
+            )
+
+    def test_mapped_file_windows_match_stream(self):
+        data = "\n".join(SAMPLES * 50).encode("utf-8")
+        path = self.write_file(data)
+
+        # Windows of a few bytes put window boundaries all through the file
+        with mock.patch("fileprocessing.wordcount.MMAP_WINDOW_SIZE", 16):
+            windowed = count_words_in_mapped_file(path)
+
+        self.assertEqual(windowed, count_words_in_mapped_file(path))
+        self.assertEqual(windowed, self.count_in_chunks(data, 4096))
+
+
+@override_settings(UPLOAD_COMPRESSION={".txt": "gzip", ".docx": "gzip"})
+class CompressedStorageTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+
+    def create_upload(self, filename, data):
+        return FileUpload.objects.create(
+            user=self.user,
+            file=ContentFile(data, name=filename),
+            filename=filename,
+            size=len(data),
+        )
+
+    def test_round_trip(self):
+        data = b"compressed words at rest\n" * 100
+        name = get_upload_storage().save("uploads/notes.txt", ContentFile(data))
+
+        self.assertTrue(name.endswith(hashlib.sha256(data).hexdigest() + ".gz"))
+        self.assertLess(get_upload_storage().size(name), len(data))
+        with get_upload_storage().open_content(name) as f:
+            self.assertEqual(f.read(), data)
+
+    def test_zstd_falls_back_to_gzip_without_zstandard(self):
+        with override_settings(UPLOAD_COMPRESSION={".txt": "zstd"}):
+            with mock.patch("fileprocessing.compression.zstandard", None):
+                with self.assertLogs("fileprocessing.compression", "WARNING"):
+                    self.assertEqual(get_compression("notes.txt"), GZIP)
+            with mock.patch("fileprocessing.compression.zstandard", object()):
+                self.assertEqual(get_compression("notes.txt"), ZSTD)
+
+    def test_counts_through_the_decompressor(self):
+        file_upload = self.create_upload("notes.txt", b"one two three\n" * 1000)
+
+        self.assertEqual(count_words(file_upload.file_id), "Done")
+
+        file_upload.refresh_from_db()
+        self.assertEqual(file_upload.status, StatusChoice.COMPLETED)
+        self.assertEqual(file_upload.word_count, 3000)
+
+    def test_compressed_docx_is_counted(self):
+        file_upload = self.create_upload(
+            "report.docx", make_docx("first paragraph", "and the second one")
+        )
+        self.assertTrue(file_upload.file.name.endswith(".gz"))
+
+        self.assertEqual(count_words(file_upload.file_id), "Done")
+
+        file_upload.refresh_from_db()
+        self.assertEqual(file_upload.status, StatusChoice.COMPLETED)
+        self.assertEqual(file_upload.word_count, 6)
+
+    def test_compressed_gz_upload_is_counted(self):
+        with override_settings(UPLOAD_COMPRESSION={".gz": "gzip"}):
+            file_upload = self.create_upload(
+                "notes.txt.gz", gzip.compress(b"gzip inside gzip")
+            )
+        self.assertTrue(file_upload.file.name.endswith(".gz"))
+
+        count_words(file_upload.file_id)
+
+        file_upload.refresh_from_db()
+        self.assertEqual(file_upload.word_count, 3)
+
+    def test_count_error_fails_the_upload(self):
+        file_upload = self.create_upload("notes.txt", b"some words")
+
+        with mock.patch(
+            "fileprocessing.analyzers.PlainTextAnalyzer.count_file",
+            side_effect=ValueError("broken"),
+        ), self.assertLogs("fileprocessing.tasks", "ERROR"):
+            self.assertEqual(count_words(file_upload.file_id), "Error")
+
+        file_upload.refresh_from_db()
+        self.assertEqual(file_upload.status, StatusChoice.FAILED)
+
+
+@override_settings(UPLOAD_CHUNK_SIZE=4, UPLOAD_SESSION_MAX_OPEN=2)
+class UploadSessionTests(MediaRootMixin, TestCase):
+    data = b"resumable upload"
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        dispatch = mock.patch("fileprocessing.views.dispatch_word_counts")
+        self.dispatch_word_counts = dispatch.start()
+        self.addCleanup(dispatch.stop)
+
+    def open_session(self, filename="notes.txt"):
+        return self.client.post(
+            "/api/upload/sessions/", {"filename": filename, "size": len(self.data)}
+        )
+
+    def put_chunk(self, session_id, index):
+        chunk = self.data[index * 4 : (index + 1) * 4]
+        return self.client.put(
+            f"/api/upload/sessions/{session_id}/chunks/{index}/",
+            chunk,
+            content_type="application/octet-stream",
+        )
+
+    def finalize(self, session_id):
+        return self.client.post(f"/api/upload/sessions/{session_id}/finalize/")
+
+    def upload_all_chunks(self):
+        add_upload_credits(self.user, 1)
+        session_id = self.open_session().data["session_id"]
+        # Chunks may come in any order
+        for index in (3, 1, 0, 2):
+            self.assertEqual(self.put_chunk(session_id, index).status_code, 200)
+        return session_id
+
+    def test_chunks_are_assembled_on_finalize(self):
+        session_id = self.upload_all_chunks()
+
+        response = self.finalize(session_id)
+
+        self.assertEqual(response.status_code, 201)
+        file_upload = FileUpload.objects.get()
+        self.assertEqual(file_upload.size, len(self.data))
+        self.assertEqual(
+            file_upload.content_hash, hashlib.sha256(self.data).hexdigest()
+        )
+        with get_upload_storage().open_content(file_upload.file.name) as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+        self.assertEqual(get_upload_credits(self.user), 0)
+        self.dispatch_word_counts.assert_called_once()
+        self.assertEqual(
+            response.data["download_url"],
+            f"http://testserver/api/file/{file_upload.file_id}/download/",
+        )
+
+    def test_missing_chunks_are_listed(self):
+        add_upload_credits(self.user, 1)
+        session_id = self.open_session().data["session_id"]
+        self.put_chunk(session_id, 1)
+
+        response = self.finalize(session_id)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["missing_chunks"], [0, 2, 3])
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+    def test_finalizing_again_returns_the_same_upload(self):
+        session_id = self.upload_all_chunks()
+        first = self.finalize(session_id)
+
+        again = self.finalize(session_id)
+
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data["file_id"], first.data["file_id"])
+        self.assertEqual(FileUpload.objects.count(), 1)
+
+    def test_chunk_after_finalize_is_a_conflict(self):
+        session_id = self.upload_all_chunks()
+        self.finalize(session_id)
+
+        self.assertEqual(self.put_chunk(session_id, 0).status_code, 409)
+
+    def test_chunk_racing_finalize_is_a_conflict(self):
+        session_id = self.upload_all_chunks()
+        session = UploadSession.objects.get(pk=session_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.finalize(session_id)
+        # A chunk that read the session before finalize removed its file
+        self.assertFalse(os.path.exists(session_path(session)))
+        with mock.patch(
+            "fileprocessing.views.get_upload_session", return_value=session
+        ):
+            self.assertEqual(self.put_chunk(session_id, 0).status_code, 409)
+
+    def test_file_is_stored_outside_the_transaction(self):
+        session_id = self.upload_all_chunks()
+        depth = len(connection.atomic_blocks)
+        depths = []
+
+        def spy(session):
+            depths.append(len(connection.atomic_blocks))
+            return import_session_file(session)
+
+        with mock.patch("fileprocessing.views.import_session_file", side_effect=spy):
+            self.assertEqual(self.finalize(session_id).status_code, 201)
+
+        self.assertEqual(depths, [depth])
+
+    def test_failed_finalize_keeps_the_credit_and_leaves_the_blob_unreferenced(self):
+        session_id = self.upload_all_chunks()
+
+        with mock.patch(
+            "fileprocessing.views.complete_session", side_effect=OSError("disk full")
+        ), self.assertLogs("fileprocessing.views", "ERROR"):
+            response = self.finalize(session_id)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(get_upload_credits(self.user), 1)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 0)
+        self.assertEqual(
+            UploadSession.objects.get(pk=session_id).status,
+            UploadSessionStatusChoice.OPEN,
+        )
+
+    def test_open_sessions_are_capped(self):
+        add_upload_credits(self.user, 5)
+        for _ in range(2):
+            self.assertEqual(self.open_session().status_code, 201)
+
+        self.assertEqual(self.open_session().status_code, 409)
+
+    def test_open_sessions_never_exceed_credits(self):
+        add_upload_credits(self.user, 1)
+        self.assertEqual(self.open_session().status_code, 201)
+
+        self.assertEqual(self.open_session().status_code, 409)
+
+    def test_sessions_need_a_credit(self):
+        self.assertEqual(self.open_session().status_code, 403)
+
+
+class DownloadURLTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        add_upload_credits(self.user, 3)
+
+    def assert_absolute(self, data):
+        self.assertEqual(
+            data["download_url"],
+            f"http://testserver/api/file/{data['file_id']}/download/",
+        )
+
+    def test_every_response_has_absolute_urls(self):
+        upload = self.client.post(
+            "/api/upload/",
+            {"file": SimpleUploadedFile("a.txt", b"one")},
+            format="multipart",
+        )
+        batch = self.client.post(
+            "/api/upload/batch/",
+            {
+                "files": [
+                    SimpleUploadedFile("b.txt", b"two"),
+                    SimpleUploadedFile("c.txt", b"three"),
+                ]
+            },
+            format="multipart",
+        )
+        listing = self.client.get("/api/file/")
+
+        self.assert_absolute(upload.data)
+        for data in batch.data + listing.data["results"]:
+            self.assert_absolute(data)
+
+    def test_download_url_serves_the_file(self):
+        upload = self.client.post(
+            "/api/upload/",
+            {"file": SimpleUploadedFile("a.txt", b"downloaded words")},
+            format="multipart",
+        )
+
+        response = self.client.get(upload.data["download_url"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"downloaded words")
+
+
+class ArchivedActivityLogTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        settings_override = override_settings(ACTIVITY_LOG_ARCHIVE_DIR=archive_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = create_user()
+        other = create_user("other")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        now = timezone.now()
+        for days_ago in range(0, 120, 9):
+            for user in (self.user, other):
+                # Two logs share each timestamp, the id breaks the tie
+                for _ in range(2):
+                    ActivityLog.objects.create(
+                        user=user,
+                        action="FILE_UPLOAD",
+                        metadata={},
+                        timestamp=now - timedelta(days=days_ago),
+                    )
+        self.expected = [
+            str(log.activity_id)
+            for log in ActivityLog.objects.filter(user=self.user).order_by(
+                "-timestamp", "-activity_id"
+            )
+        ]
+
+        archive_activity_logs(now - timedelta(days=45))
+
+    def page_through(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [log["activity_id"] for log in response.data["results"]]
+            url = response.data["next"]
+        return seen
+
+    def test_archive_spans_several_month_files(self):
+        self.assertGreater(ActivityLogArchive.objects.count(), 1)
+        self.assertLess(ActivityLog.objects.filter(user=self.user).count(), 14)
+
+    def test_cursor_merges_live_and_archived_logs(self):
+        start = (timezone.now() - timedelta(days=200)).date()
+
+        seen = self.page_through(f"/api/activity/?start={start}&page_size=3")
+
+        self.assertEqual(seen, self.expected)
+
+    def test_without_a_date_range_only_live_logs_are_listed(self):
+        live = self.page_through("/api/activity/?page_size=3")
+
+        self.assertEqual(live, self.expected[: len(live)])
+        self.assertEqual(len(live), ActivityLog.objects.filter(user=self.user).count())
+
+
+class UploadSerializerTests(SimpleTestCase):
+    def test_files_not_stored_while_uploading_are_refused(self):
+        file = SimpleUploadedFile("notes.txt", b"never streamed")
+
+        single = FileUploadSerializer(data={"file": file})
+        batch = BatchFileUploadSerializer(data={"files": [file]})
+
+        self.assertFalse(single.is_valid())
+        self.assertIn("file", single.errors)
+        self.assertFalse(batch.is_valid())
+        self.assertIn("files", batch.errors)
+
+
+class StreamingUploadTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        add_upload_credits(self.user, 5)
+
+    def stream(self, data, piece_size, filename="notes.txt"):
+        handler = StreamingUploadHandler(max_files=1)
+        handler.new_file("file", filename, "text/plain", len(data))
+        for offset in range(0, len(data), piece_size):
+            handler.receive_data_chunk(data[offset : offset + piece_size], offset)
+        return handler.file_complete(len(data))
+
+    def temp_files(self):
+        temp_dir = get_upload_storage().path(TEMP_DIR)
+        return os.listdir(temp_dir) if os.path.isdir(temp_dir) else []
+
+    def test_pieces_are_hashed_and_counted_as_a_whole(self):
+        data = "\n".join(SAMPLES).encode("utf-8")
+
+        for piece_size in (1, 3, 64, len(data)):
+            stored = self.stream(data, piece_size)
+
+            self.assertEqual(stored.content_hash, hashlib.sha256(data).hexdigest())
+            self.assertEqual(
+                stored.word_count, count_matches(TXT_WORD_RE, data.decode())
+            )
+            with get_upload_storage().open_content(stored.stored_name) as f:
+                self.assertEqual(f.read(), data)
+
+    def test_formats_without_a_byte_counter_are_counted_later(self):
+        self.assertIsNone(self.stream(make_docx("one two"), 64, "a.docx").word_count)
+
+    def test_upload_is_complete_when_the_request_returns(self):
+        response = self.client.post(
+            "/api/upload/",
+            {"file": SimpleUploadedFile("notes.txt", b"three words here")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        file_upload = FileUpload.objects.get()
+        self.assertEqual(file_upload.word_count, 3)
+        self.assertEqual(file_upload.status, StatusChoice.COMPLETED)
+        self.assertEqual(
+            file_upload.content_hash, hashlib.sha256(b"three words here").hexdigest()
+        )
+
+    def test_too_many_files_are_refused(self):
+        files = [SimpleUploadedFile(f"{n}.txt", b"words") for n in range(3)]
+
+        with mock.patch.object(BatchFileUploadAPIView, "max_upload_files", 2):
+            response = self.client.post(
+                "/api/upload/batch/", {"files": files}, format="multipart"
+            )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(
+            response.data["detail"], "Too many files, at most 2 per request"
+        )
+        self.assertFalse(FileUpload.objects.exists())
+        self.assertEqual(get_upload_credits(self.user), 5)
+        self.assertEqual(self.temp_files(), [])
+
+    def test_second_file_to_a_single_upload_is_refused(self):
+        response = self.client.post(
+            "/api/upload/",
+            {
+                "file": [
+                    SimpleUploadedFile("a.txt", b"one"),
+                    SimpleUploadedFile("b.txt", b"two"),
+                ]
+            },
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(FileUpload.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=10)
+    def test_oversized_file_is_refused(self):
+        response = self.client.post(
+            "/api/upload/",
+            {"file": SimpleUploadedFile("notes.txt", b"x" * 1000)},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.temp_files(), [])
+
+
+@override_settings(
+    WORD_COUNT_SMALL_FILE_MAX_SIZE=1024 * 1024,
+    WORD_COUNT_SMALL_QUEUE="small",
+    WORD_COUNT_LARGE_QUEUE="large",
+)
+class WordCountOptionsTests(SimpleTestCase):
+    def options(self, size):
+        return word_count_options(FileUpload(size=size))
+
+    def test_queue_boundary(self):
+        self.assertEqual(self.options(1024 * 1024)["queue"], "small")
+        self.assertEqual(self.options(1024 * 1024 + 1)["queue"], "large")
+
+    def test_priority_steps_every_fourfold_size(self):
+        kib = 1024
+        expected = {
+            0: 0,
+            4 * kib - 1: 0,
+            4 * kib: 1,
+            16 * kib - 1: 1,
+            16 * kib: 2,
+            64 * kib: 3,
+            256 * kib * 1024 - 1: 8,
+            256 * kib * 1024: 9,
+            4 * kib * 1024 * 1024: 9,
+        }
+        for size, priority in expected.items():
+            self.assertEqual(self.options(size)["priority"], priority, size)
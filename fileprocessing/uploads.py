@@ -0,0 +1,159 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+
+from .analyzers import get_analyzer
+from .compression import get_compression, open_writer
+from .storage import get_upload_directory, get_upload_storage
+
+# Room for the multipart boundaries, part headers and form fields of a request
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def get_file_type_error(filename):
+    """
+    Return why a file name is refused by FILE_UPLOAD_ALLOWED_EXTENSIONS, or None
+    """
+    extension = os.path.splitext(filename.lower())[1]
+    allowed = [e.lower() for e in settings.FILE_UPLOAD_ALLOWED_EXTENSIONS]
+    if allowed and extension not in allowed:
+        return f"File type {extension or 'without extension'} is not allowed"
+
+    return None
+
+
+class StoredUploadedFile(UploadedFile):
+    """
+    An upload already written to its final place in storage, with the SHA-256 of
+    its content and, for formats counted while streaming, its word count
+    """
+
+    def __init__(
+        self, stored_name, name, content_type, size, charset, content_hash, word_count
+    ):
+        super().__init__(
+            file=None, name=name, content_type=content_type, size=size, charset=charset
+        )
+        self.stored_name = stored_name
+        self.content_hash = content_hash
+        self.word_count = word_count
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Upload handler writing each file straight to the upload storage while it is
+    received, hashing it and counting its words in the same pass, so the upload
+    touches the disk once. File types listed in UPLOAD_COMPRESSION are compressed
+    on the way. Complete files are moved to their content address.
+
+    Requests too large for `max_files` files of FILE_UPLOAD_MAX_SIZE bytes are
+    refused before any of the body is read. Files are counted as their parts
+    arrive: a file past `max_files`, a file growing past the size limit or with an
+    extension outside FILE_UPLOAD_ALLOWED_EXTENSIONS stops the upload. `error`
+    then holds the status code and message to answer with.
+    """
+
+    def __init__(self, request=None, max_files=1):
+        super().__init__(request)
+        self.max_files = max_files
+        self.file_count = 0
+        self.max_size = settings.FILE_UPLOAD_MAX_SIZE
+        self.storage = get_upload_storage()
+        self.directory = get_upload_directory()
+        self.temp_path = None
+        self.error = None
+
+    def reject(self, status_code, message):
+        self.error = (status_code, message)
+        self.discard()
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length > self.max_size * self.max_files + MULTIPART_OVERHEAD:
+            self.error = (
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"Upload is larger than {self.max_size} bytes per file",
+            )
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+
+        self.file_count += 1
+        if self.file_count > self.max_files:
+            self.reject(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"Too many files, at most {self.max_files} per request",
+            )
+        file_type_error = get_file_type_error(self.file_name)
+        if file_type_error:
+            self.reject(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, file_type_error)
+        if self.content_length is not None and self.content_length > self.max_size:
+            self.reject(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"File is larger than {self.max_size} bytes",
+            )
+
+        self.sha256 = hashlib.sha256()
+        self.compression = get_compression(self.file_name)
+        analyzer = get_analyzer(self.file_name)
+        self.counter = analyzer.byte_counter() if analyzer is not None else None
+        self.open_destination()
+
+    def open_destination(self):
+        self.temp_path = self.storage.temp_path()
+        self.destination = open(self.temp_path, "xb")
+        self.file = open_writer(self.destination, self.compression)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.reject(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"File is larger than {self.max_size} bytes",
+            )
+
+        self.file.write(raw_data)
+        self.sha256.update(raw_data)
+        if self.counter is not None:
+            self.counter.feed(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.close()
+        self.destination.close()
+        content_hash = self.sha256.hexdigest()
+        stored_name = self.storage.store_blob(
+            self.temp_path, self.directory, content_hash, self.compression
+        )
+        self.temp_path = None
+
+        return StoredUploadedFile(
+            stored_name=stored_name,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_hash=content_hash,
+            word_count=self.counter.close() if self.counter is not None else None,
+        )
+
+    def discard(self):
+        """
+        Drop the file being received, for uploads that are not kept. Complete files
+        are unreferenced blobs, deleted later by collect_unused_blobs.
+        """
+        if getattr(self, "destination", None) is not None:
+            self.file.close()
+            self.destination.close()
+        if self.temp_path is not None and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
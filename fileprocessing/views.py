@@ -1,87 +1,485 @@
+import heapq
 import logging
 
+from celery import group
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse
+from django.utils import timezone
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from payment.choices import StatusChoice
-from payment.models import PaymentTransaction
+from payment.quota import (
+    add_upload_credits,
+    consume_upload_credits,
+    get_upload_credits,
+)
+from utils.dates import parse_date_range
+from utils.filters import ListingFilter, get_user_param
+from utils.listing import FastListMixin
 from utils.logger import ActivityLogger
+from utils.pagination import KeysetPagination
 
-from .models import ActivityLog, FileUpload
-from .serializers import ActivityLogSerializer, FileUploadSerializer
-from .tasks import count_words
+from .analyzers import get_analyzer
+from .archive import get_archived_page
+from .cache import complete_from_cache, complete_many_from_cache, get_cache_stats
+from .chunked import (
+    UploadSessionClosed,
+    chunk_count,
+    chunk_length,
+    complete_session,
+    count_open_sessions,
+    delete_session,
+    import_session_file,
+    missing_chunks,
+    write_chunk,
+)
+from .choices import StatusChoice, UploadSessionStatusChoice
+from .compression import compression_of
+from .models import ActivityLog, FileUpload, UploadSession
+from .serializers import (
+    ActivityLogSerializer,
+    BatchFileUploadSerializer,
+    FileUploadSerializer,
+    UploadSessionSerializer,
+)
+from .storage import get_upload_storage
+from .tasks import complete_word_count, count_words, word_count_options
+from .uploads import StreamingUploadHandler
 
 logger = logging.getLogger(__name__)
 
 
+def dispatch_word_counts(file_uploads):
+    """
+    Complete the uploads whose words were counted while they streamed in and
+    queue counting tasks for the rest, on the queue and with the priority of their size
+    """
+    pending = []
+    for file_upload in file_uploads:
+        if file_upload.word_count is None:
+            pending.append(file_upload)
+        else:
+            complete_word_count(
+                file_upload, file_upload.word_count, get_analyzer(file_upload.filename)
+            )
+
+    if len(pending) == 1:
+        count_words.apply_async((pending[0].file_id,), **word_count_options(pending[0]))
+    elif pending:
+        group(
+            count_words.s(f.file_id).set(**word_count_options(f)) for f in pending
+        ).apply_async()
+
+
 class FileUploadAPIView(APIView):
     """
     API view to handle file uploads by Authenticated user.
-    Allow file uploads only if the user paid for more uploads than they have already used
+    Allow file uploads only while the user has unused upload credits, one bought per payment.
+    Files are streamed straight to storage by StreamingUploadHandler
     """
 
     permission_classes = [IsAuthenticated]
+    max_upload_files = 1
 
-    def has_unused_payment(self, request):
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be set before anything reads the request body
+        self.upload_handler = StreamingUploadHandler(request, self.max_upload_files)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def upload_error_response(self):
+        status_code, message = self.upload_handler.error
+        return Response({"detail": message}, status=status_code)
+
+    def reserve_uploads(self, request, files=1):
         """
-        Check user have more paid transactions than file upload
+        Take one upload credit per file from the user's prepaid quota
         """
         try:
-            total_payment = PaymentTransaction.objects.filter(
-                user=request.user, status=StatusChoice.PAID
-            ).count()
-            total_file_upload = FileUpload.objects.filter(user=request.user).count()
-
-            return total_payment > total_file_upload
+            return consume_upload_credits(request.user, files)
         except Exception as e:
             logger.error(
-                f"Error checking unused payment for user {request.user}=> {e}",
+                f"Error reserving upload credits for user {request.user}=> {e}",
                 exc_info=True,
             )
             return False
 
+    def release_uploads(self, request, files=1):
+        """
+        Give back credits reserved for uploads that could not be saved
+        """
+        try:
+            add_upload_credits(request.user, files)
+        except Exception as e:
+            logger.error(
+                f"Error releasing upload credits for user {request.user}=> {e}",
+                exc_info=True,
+            )
+
     def post(self, request):
         """
         Handle post request to upload file
         """
         try:
-            if not self.has_unused_payment(request):
+            serializer = FileUploadSerializer(
+                data=request.data, context={"request": request}
+            )
+            if self.upload_handler.error:
+                return self.upload_error_response()
+            if not serializer.is_valid():
+                self.upload_handler.discard()
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            if not self.reserve_uploads(request):
+                self.upload_handler.discard()
                 return Response(
                     {
                         "detail": "Payment required. Please complete payment before uploading file"
                     },
                     status=status.HTTP_403_FORBIDDEN,
                 )
-            serializer = FileUploadSerializer(data=request.data)
-            if serializer.is_valid():
+
+            try:
                 file_upload = serializer.save(user=request.user)
+            except Exception:
+                self.release_uploads(request)
+                self.upload_handler.discard()
+                raise
 
-                ActivityLogger.log_file_upload(
-                    request.user, serializer.data.get("filename")
+            ActivityLogger.log_file_upload(request.user, file_upload.filename)
+            if not complete_from_cache(file_upload):
+                dispatch_word_counts([file_upload])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error(f"Error occure during file upload=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server error during file upload"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BatchFileUploadAPIView(FileUploadAPIView):
+    """
+    API view to upload several files in one request.
+    Credits are reserved once for the whole batch, rows are bulk inserted and the word
+    counts are dispatched as one Celery group
+    """
+
+    max_upload_files = settings.FILE_UPLOAD_BATCH_MAX_FILES
+
+    def post(self, request):
+        """
+        Handle post request to upload files sent as repeated `files` fields
+        """
+        try:
+            serializer = BatchFileUploadSerializer(
+                data=request.data, context={"request": request}
+            )
+            if self.upload_handler.error:
+                return self.upload_error_response()
+            if not serializer.is_valid():
+                self.upload_handler.discard()
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            files = len(serializer.validated_data["files"])
+            if not self.reserve_uploads(request, files):
+                self.upload_handler.discard()
+                return Response(
+                    {
+                        "detail": "Payment required. Please complete one payment per uploaded file"
+                    },
+                    status=status.HTTP_403_FORBIDDEN,
                 )
-                count_words.delay(file_upload.file_id)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                file_uploads = serializer.save(user=request.user)
+            except Exception:
+                self.release_uploads(request, files)
+                self.upload_handler.discard()
+                raise
+
+            ActivityLogger.log_file_uploads(
+                request.user, [file_upload.filename for file_upload in file_uploads]
+            )
+
+            dispatch_word_counts(complete_many_from_cache(file_uploads))
+
+            return Response(
+                FileUploadSerializer(
+                    file_uploads, many=True, context={"request": request}
+                ).data,
+                status=status.HTTP_201_CREATED,
+            )
         except Exception as e:
-            logger.error(f"Error occure during file upload=> {e}", exc_info=True)
+            logger.error(f"Error occure during batch file upload=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server error during file upload"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class UploadSessionExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Upload session expired, start a new one"
+    default_code = "upload_session_expired"
+
+
+def get_upload_session(request, session_id):
+    """
+    Return an upload session of the requesting user, refusing open sessions past their expiry
+    """
+    session = UploadSession.objects.filter(user=request.user, pk=session_id).first()
+    if session is None:
+        raise NotFound("Upload session not found")
+    if (
+        session.status == UploadSessionStatusChoice.OPEN
+        and session.expires_at < timezone.now()
+    ):
+        raise UploadSessionExpired()
+
+    return session
+
+
+class UploadSessionCreateView(APIView):
+    """
+    API view to start a resumable upload of a large file, in chunks of UPLOAD_CHUNK_SIZE bytes.
+    The upload credit is only taken when the session is finalized, so a user may only
+    have as many open sessions as credits left, and at most UPLOAD_SESSION_MAX_OPEN
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Handle post request with the `filename` and `size` of the file to upload
+        """
+        try:
+            serializer = UploadSessionSerializer(
+                data=request.data, context={"request": request}
+            )
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            with transaction.atomic():
+                # The locked quota row keeps concurrent requests of the user from
+                # opening sessions past the limit
+                credits = get_upload_credits(request.user, lock=True)
+                if credits < 1:
+                    return Response(
+                        {
+                            "detail": "Payment required. Please complete payment before uploading file"
+                        },
+                        status=status.HTTP_403_FORBIDDEN,
+                    )
+
+                limit = min(credits, settings.UPLOAD_SESSION_MAX_OPEN)
+                if count_open_sessions(request.user) >= limit:
+                    return Response(
+                        {
+                            "detail": f"At most {limit} upload sessions can be open, finalize or delete one first"
+                        },
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
+                serializer.save(user=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error(f"Error creating upload session=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server error creating upload session"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class UploadSessionDetailView(APIView):
+    """
+    API view to see which chunks of an upload session were received, or abandon it
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, session_id):
+        session = get_upload_session(request, session_id)
+        return Response(
+            UploadSessionSerializer(session, context={"request": request}).data
+        )
+
+    def delete(self, request, session_id):
+        session = get_upload_session(request, session_id)
+        if session.status != UploadSessionStatusChoice.OPEN:
+            return Response(
+                {"detail": "Upload session is already finalized"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        try:
+            delete_session(session)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        except Exception as e:
+            logger.error(f"Error deleting upload session=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server error deleting upload session"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class UploadChunkView(APIView):
+    """
+    API view receiving one chunk of an upload session as the raw request body.
+    The body is copied to its place in the session file as it is read, never held in memory.
+    Chunks can be sent in any order and sent again after a failure
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, session_id, index):
+        session = get_upload_session(request, session_id)
+        if session.status != UploadSessionStatusChoice.OPEN:
+            return Response(
+                {"detail": "Upload session is already finalized"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if index >= chunk_count(session):
+            return Response(
+                {"detail": f"Chunk index must be below {chunk_count(session)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        length = chunk_length(session, index)
+        if request.META.get("CONTENT_LENGTH") != str(length):
+            return Response(
+                {"detail": f"Chunk {index} must be exactly {length} bytes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            received = write_chunk(session, index, request.stream, length)
+            if received != length:
+                return Response(
+                    {
+                        "detail": f"Chunk {index} is incomplete, received {received} of {length} bytes"
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            return Response({"index": index, "size": length})
+        except UploadSessionClosed:
+            return Response(
+                {"detail": "Upload session is already finalized"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except Exception as e:
+            logger.error(f"Error writing upload chunk=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server error writing upload chunk"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class UploadSessionFinalizeView(APIView):
+    """
+    API view turning a fully received upload session into a file upload.
+    Takes one upload credit and queues the word count, like a direct upload.
+    Finalizing a session again returns the same file upload
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def completed_response(self, request, session):
+        if session.file_upload is None:
+            return Response(
+                {"detail": "The file upload of this session was deleted"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            FileUploadSerializer(session.file_upload, context={"request": request}).data
+        )
+
+    def payment_required(self):
+        return Response(
+            {
+                "detail": "Payment required. Please complete payment before uploading file"
+            },
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    def post(self, request, session_id):
+        session = get_upload_session(request, session_id)
+        if session.status == UploadSessionStatusChoice.COMPLETED:
+            return self.completed_response(request, session)
+
+        missing = missing_chunks(session)
+        if missing:
+            return Response(
+                {
+                    "detail": f"{len(missing)} chunks are missing",
+                    "missing_chunks": missing,
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        # Checked again when the credit is taken, this only avoids storing a file for nothing
+        if get_upload_credits(request.user) < 1:
+            return self.payment_required()
+
+        try:
+            # The file is stored before any lock is taken, reading it can take long
+            stored_name, content_hash = import_session_file(session)
+
+            with transaction.atomic():
+                session = (
+                    UploadSession.objects.select_for_update()
+                    .filter(pk=session.pk)
+                    .first()
+                )
+                if session is None:
+                    raise NotFound("Upload session not found")
+                if session.status == UploadSessionStatusChoice.COMPLETED:
+                    # Finalized by a concurrent request, the blob it stored is the same
+                    return self.completed_response(request, session)
+                if not consume_upload_credits(request.user):
+                    return self.payment_required()
+
+                file_upload = complete_session(session, stored_name, content_hash)
+
+            ActivityLogger.log_file_upload(request.user, file_upload.filename)
+            if not complete_from_cache(file_upload):
+                dispatch_word_counts([file_upload])
+            return Response(
+                FileUploadSerializer(file_upload, context={"request": request}).data,
+                status=status.HTTP_201_CREATED,
+            )
+        except NotFound:
+            raise
+        except FileNotFoundError:
+            # The session was deleted while its file was being stored
+            raise NotFound("Upload session not found")
+        except Exception as e:
+            logger.error(f"Error finalizing upload session=> {e}", exc_info=True)
             return Response(
                 {"detail": "Server error during file upload"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
 
-class FileListView(generics.ListAPIView):
+class FileListView(FastListMixin, generics.ListAPIView):
     """
     API view to list upload files
-    Staff user can see all files and regular user sees only their own
+    Staff user can see all files and regular user sees only their own.
+    Filter with `status`, `filename` prefix, `start`/`end` upload time and `user`(Staff)
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = FileUploadSerializer
     queryset = FileUpload.objects.select_related("user")
+    pagination_class = KeysetPagination
+    keyset_field = "upload_time"
+    filter_backends = [ListingFilter]
+    filter_fields = {"status": StatusChoice.values}
+    prefix_filter_fields = ["filename"]
 
     def get_queryset(self):
         try:
@@ -96,15 +494,77 @@ class FileListView(generics.ListAPIView):
             return FileUpload.objects.none()
 
 
-class ActivityLogList(generics.ListAPIView):
+class ContentReader:
+    """
+    Read-only file object over a decompressing reader. FileResponse sizes seekable
+    files by seeking to their end, which would decompress a gzip blob twice.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def read(self, size=-1):
+        return self.reader.read(size)
+
+    def close(self):
+        self.reader.close()
+
+
+class FileDownloadView(APIView):
+    """
+    API view to download an uploaded file under the name it was uploaded with.
+    Staff user can download any file and regular user only their own.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, file_id):
+        file_uploads = FileUpload.objects.filter(file_id=file_id)
+        if not request.user.is_staff:
+            file_uploads = file_uploads.filter(user=request.user)
+        file_upload = file_uploads.first()
+        if file_upload is None:
+            raise NotFound("File not found")
+
+        try:
+            name = file_upload.file.name
+            content = get_upload_storage().open_content(name)
+            if compression_of(name) is None:
+                return FileResponse(
+                    content, as_attachment=True, filename=file_upload.filename
+                )
+
+            response = FileResponse(
+                ContentReader(content),
+                as_attachment=True,
+                filename=file_upload.filename,
+            )
+            if file_upload.size is not None:
+                response["Content-Length"] = file_upload.size
+            return response
+        except Exception as e:
+            logger.error(f"Error occure downloading file=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server error downloading file"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class ActivityLogList(FastListMixin, generics.ListAPIView):
     """
     API view to list activity logs.
-    Staff user can see all logs and regular user sees only their own
+    Staff user can see all logs and regular user sees only their own.
+    Newest first, paginated with a cursor. Filter with `action` and `user`(Staff).
+    With a `start`/`end` date range, logs moved to the archive are included.
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = ActivityLogSerializer
     queryset = ActivityLog.objects.select_related("user")
+    pagination_class = KeysetPagination
+    keyset_field = "timestamp"
+    filter_backends = [ListingFilter]
+    filter_fields = {"action": None}
 
     def get_queryset(self):
         try:
@@ -117,3 +577,61 @@ class ActivityLogList(generics.ListAPIView):
         except Exception as e:
             logger.error(f"Error occure fetching logs list=> {e}", exc_info=True)
             return ActivityLog.objects.none()
+
+    def list(self, request, *args, **kwargs):
+        try:
+            start, end = parse_date_range(request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start is None and end is None:
+            return super().list(request, *args, **kwargs)
+
+        encoder = self.get_row_encoder()
+        logs = self.paginate_queryset(self.get_rows(encoder))
+
+        user_id = request.user.pk
+        if request.user.is_staff:
+            user_id = get_user_param(request)
+        # Archived logs can only enter the page between the cursor and the last live
+        # row, files outside that window are skipped by their index rows
+        archived = get_archived_page(
+            self.paginator.size + 1,
+            start,
+            end,
+            before=self.paginator.cursor,
+            after=self.paginator.next_key,
+            user_id=user_id,
+            action=request.query_params.get("action"),
+        )
+        if archived:
+            logs = self.paginator.paginate_objects(
+                heapq.merge(
+                    logs,
+                    map(encoder.instance_row, archived),
+                    key=self.paginator.get_key,
+                    reverse=True,
+                ),
+                request,
+                self,
+            )
+
+        return self.get_paginated_response(encoder.encode(logs))
+
+
+class WordCountCacheStatsView(APIView):
+    """
+    API view to monitor the word count result cache(Admin Only)
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            return Response(get_cache_stats())
+        except Exception as e:
+            logger.error(f"Error fetching word count cache stats=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server Error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
@@ -0,0 +1,282 @@
+import codecs
+import mmap
+import os
+import re
+import zipfile
+
+from lxml import etree
+
+# Word patterns used by the word count tasks, kept identical to the original
+# `re.findall` based implementation so streamed counts match exactly.
+TXT_WORD_RE = re.compile(r"\b[a-zA-Z0-9'-]+\b")
+DOCX_WORD_RE = re.compile(r"\b[a-zA-Z0-9'’'-]+\b")
+
+# Byte level equivalent of TXT_WORD_RE. It only agrees with the str pattern on
+# ASCII input, where bytes and str `\b` see the same word characters.
+TXT_WORD_BYTES_RE = re.compile(rb"\b[a-zA-Z0-9'-]+\b")
+_NON_ASCII_BYTE_RE = re.compile(rb"[\x80-\xff]")
+WHITESPACE_BYTE_RE = re.compile(rb"[ \t\n\r\x0b\x0c]")
+
+CHUNK_SIZE = 64 * 1024
+MMAP_WINDOW_SIZE = 8 * 1024 * 1024
+
+# Matches everything up to and including the last character that can neither be
+# part of a word nor change a word boundary. Text can be split right after such a
+# character without changing what the word patterns above match on either side.
+_LAST_SEPARATOR_RE = re.compile(r".*[^\w'’-]", re.DOTALL)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = f"{_W}body"
+W_P = f"{_W}p"
+W_R = f"{_W}r"
+W_HYPERLINK = f"{_W}hyperlink"
+W_T = f"{_W}t"
+W_BR = f"{_W}br"
+W_TYPE = f"{_W}type"
+
+# Text equivalents of run content elements, as python-docx renders them.
+_RUN_CHARS = {
+    f"{_W}tab": "\t",
+    f"{_W}ptab": "\t",
+    f"{_W}cr": "\n",
+    f"{_W}noBreakHyphen": "-",
+}
+
+DOCX_MAIN_PART = "word/document.xml"
+_DOCX_EXTRA_PART_RE = re.compile(r"word/(header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+
+def count_matches(pattern, text):
+    """
+    Count pattern matches in text without building a list of them
+    """
+    return sum(1 for _ in pattern.finditer(text))
+
+
+def count_matches_in_range(pattern, buffer, start, end):
+    """
+    Count pattern matches in buffer[start:end] without slicing the buffer
+    """
+    return sum(1 for _ in pattern.finditer(buffer, start, end))
+
+
+class StreamingWordCounter:
+    """
+    Count words in text that arrives in chunks.
+
+    Only the tail of the last chunk after its final separator is carried over to
+    the next one, so memory stays bounded by the chunk size (plus the longest
+    run of text without a separator) no matter how large the input is.
+    """
+
+    def __init__(self, pattern=TXT_WORD_RE):
+        self.pattern = pattern
+        self.total = 0
+        self._carry = ""
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+
+        buffer = self._carry + chunk
+        match = _LAST_SEPARATOR_RE.match(buffer)
+        if match is None:
+            self._carry = buffer
+            return
+
+        cut = match.end()
+        self.total += count_matches(self.pattern, buffer[:cut])
+        self._carry = buffer[cut:]
+
+    def close(self):
+        if self._carry:
+            self.total += count_matches(self.pattern, self._carry)
+            self._carry = ""
+
+        return self.total
+
+
+class ByteStreamWordCounter:
+    """
+    Count words in encoded text that arrives in byte chunks, such as an upload
+    being received. Multi-byte characters split across chunks are decoded whole.
+    """
+
+    def __init__(self, encoding="utf-8", pattern=TXT_WORD_RE):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._counter = StreamingWordCounter(pattern)
+
+    def feed(self, chunk):
+        self._counter.feed(self._decoder.decode(chunk))
+
+    def close(self):
+        self._counter.feed(self._decoder.decode(b"", final=True))
+        return self._counter.close()
+
+
+def iter_chunks(f, chunk_size=CHUNK_SIZE):
+    """
+    Yield fixed-size chunks from an open file until it is exhausted
+    """
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def count_words_in_chunks(chunks, pattern=TXT_WORD_RE):
+    """
+    Count words across an iterable of text chunks
+    """
+    counter = StreamingWordCounter(pattern)
+    for chunk in chunks:
+        counter.feed(chunk)
+
+    return counter.close()
+
+
+def _window_end(buffer, start, end):
+    """
+    Return an offset past `start` that ends a window right after an ASCII
+    whitespace byte, or `end`.
+
+    Those bytes never occur inside a multi-byte UTF-8 sequence and always separate
+    words, so every window decodes and counts independently.
+    """
+    limit = start + MMAP_WINDOW_SIZE
+    if limit >= end:
+        return end
+
+    split = max(buffer.rfind(b" ", start, limit), buffer.rfind(b"\n", start, limit))
+    if split != -1:
+        return split + 1
+
+    match = WHITESPACE_BYTE_RE.search(buffer, limit, end)
+    return match.end() if match else end
+
+
+def count_words_in_buffer(buffer, start=0, end=None, encoding="utf-8"):
+    """
+    Count words in buffer[start:end] of encoded text without decoding ASCII parts.
+
+    Windows made only of ASCII bytes are matched directly with the bytes pattern,
+    the rest are decoded and matched with the str pattern.
+    """
+    end = len(buffer) if end is None else end
+    total = 0
+
+    while start < end:
+        window_end = _window_end(buffer, start, end)
+
+        if _NON_ASCII_BYTE_RE.search(buffer, start, window_end):
+            text = buffer[start:window_end].decode(encoding, errors="replace")
+            total += count_matches(TXT_WORD_RE, text)
+        else:
+            total += count_matches_in_range(
+                TXT_WORD_BYTES_RE, buffer, start, window_end
+            )
+
+        start = window_end
+
+    return total
+
+
+def count_words_in_mapped_file(file_path, start=0, end=None, encoding="utf-8"):
+    """
+    Count words in a text file, or a byte range of it, through a read-only mmap
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return count_words_in_buffer(
+                buffer, start, size if end is None else min(end, size), encoding
+            )
+
+
+def _run_text(run):
+    parts = []
+    for child in run:
+        if child.tag == W_T:
+            parts.append(child.text or "")
+        elif child.tag == W_BR:
+            # Only line breaks produce text, page and column breaks do not
+            if child.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif child.tag in _RUN_CHARS:
+            parts.append(_RUN_CHARS[child.tag])
+
+    return "".join(parts)
+
+
+def _paragraph_text(paragraph):
+    """
+    Text of a w:p element, built the same way as python-docx `Paragraph.text`
+    """
+    parts = []
+    for child in paragraph:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(run) for run in child if run.tag == W_R)
+
+    return "".join(parts)
+
+
+def iter_docx_part_paragraphs(stream, body_only=True):
+    """
+    Incrementally parse a WordprocessingML part and yield paragraph texts.
+
+    With `body_only` only top level body paragraphs are yielded, which is what
+    python-docx `Document.paragraphs` returns. Otherwise every paragraph in the
+    part is yielded, including ones inside tables and text boxes.
+    Processed elements are cleared so the parsed tree never grows with the document.
+    """
+    for _, elem in etree.iterparse(stream, events=("end",), tag=W_P, huge_tree=True):
+        parent = elem.getparent()
+        at_body = parent is not None and parent.tag == W_BODY
+
+        if body_only and not at_body:
+            continue
+
+        yield _paragraph_text(elem)
+
+        elem.clear(keep_tail=True)
+        if at_body:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def iter_docx_paragraphs(file_path, include_all_parts=False):
+    """
+    Yield paragraph texts of a DOCX file straight from its zip parts.
+
+    By default only the body paragraphs of word/document.xml are read. With
+    `include_all_parts` tables, text boxes, headers, footers, footnotes and
+    endnotes are included as well.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        part_names = [DOCX_MAIN_PART]
+        if include_all_parts:
+            part_names += sorted(
+                name for name in archive.namelist() if _DOCX_EXTRA_PART_RE.match(name)
+            )
+
+        for name in part_names:
+            with archive.open(name) as stream:
+                yield from iter_docx_part_paragraphs(
+                    stream, body_only=not include_all_parts
+                )
+
+
+def count_words_in_docx(file_path, include_all_parts=False):
+    """
+    Count words in a DOCX file without building the python-docx object tree
+    """
+    return sum(
+        count_matches(DOCX_WORD_RE, text)
+        for text in iter_docx_paragraphs(file_path, include_all_parts)
+    )
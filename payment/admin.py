@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentTransaction
+from .models import PaymentCallbackInbox, PaymentTransaction, UploadQuota
 
 @admin.register(PaymentTransaction)
 class PaymentTransactionAdmin(admin.ModelAdmin):
@@ -10,4 +10,25 @@ class PaymentTransactionAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj = None):
         return False
     def has_change_permission(self, request, obj = None):
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(UploadQuota)
+class UploadQuotaAdmin(admin.ModelAdmin):
+    list_display = ['user', 'credits', 'updated_at']
+    search_fields = ['user__username']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
+
+@admin.register(PaymentCallbackInbox)
+class PaymentCallbackInboxAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'transaction_id', 'received_at', 'processed_at', 'attempts', 'last_error']
+    list_filter = ['kind', 'received_at', 'attempts']
+    search_fields = ['transaction_id']
+
+    def has_delete_permission(self, request, obj = None):
+        return False
+    def has_change_permission(self, request, obj = None):
+        return False
@@ -4,4 +4,7 @@ class StatusChoice(models.TextChoices):
         PAID = "Paid", "Paid"
         PENDING = "Pending", "Pending"
         FAILED = "Failed", "Failed"
-        EXPIRED = "Expired", "Expireds"
\ No newline at end of file
+        EXPIRED = "Expired", "Expireds"
+class CallbackKindChoice(models.TextChoices):
+        SUCCESS = "success", "Success"
+        FAILURE = "failure", "Failure"
@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.retry import Retry
+
+from utils import metrics
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+METRIC_PREFIX = "payment_gateway"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+OUTCOMES = ("success", "error", "timeout", "rejected")
+
+
+class GatewayError(Exception):
+    """
+    Raised when the payment gateway cannot be reached or answers with an error
+    """
+
+
+class GatewayNotReached(GatewayError):
+    """
+    Raised when the gateway certainly did not process the request: the connection
+    could not be opened or it answered 503, so no payment was initiated
+    """
+
+
+class GatewayUnavailable(GatewayNotReached):
+    """
+    Raised without calling the gateway while its circuit breaker is open
+    """
+
+
+def is_connect_error(e):
+    """
+    Whether a requests error happened while connecting, before the request was sent
+    """
+    if isinstance(e, requests.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class AamarPayClient:
+    """
+    HTTP client for the aamarPay JSON API.
+
+    One keep-alive connection pool is shared by every request of the process.
+    Every call has strict connect/read timeouts. Only failures where the gateway
+    did not process the request (errors while connecting, 503 answers) are retried
+    with exponential backoff, so a payment is never initiated twice. A 502 may come
+    from a proxy after the gateway processed the request and is not retried.
+    Calls go through a circuit breaker so a failing or slow gateway is refused
+    fast instead of tying up request workers.
+    """
+
+    RETRY_STATUSES = (503,)
+
+    def __init__(
+        self,
+        url,
+        connect_timeout=3.05,
+        read_timeout=10,
+        max_retries=2,
+        backoff_factor=0.3,
+        pool_size=10,
+        breaker=None,
+    ):
+        self.url = url
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def is_available(self):
+        """
+        Check whether the circuit breaker currently lets gateway calls through
+        """
+        return self.breaker.is_available()
+
+    def initiate_payment(self, payload):
+        """
+        Send a payment request and return the decoded gateway response
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            metrics.increment(f"{METRIC_PREFIX}:rejected")
+            raise GatewayUnavailable("Payment gateway circuit breaker is open") from e
+
+        outcome = "error"
+        started = time.monotonic()
+        try:
+            response = self.session.post(
+                self.url, data=json.dumps(payload), timeout=self.timeout
+            )
+            if response.status_code in self.RETRY_STATUSES:
+                raise GatewayNotReached(
+                    f"Payment gateway answered with status {response.status_code}"
+                )
+            if response.status_code >= 500:
+                raise GatewayError(
+                    f"Payment gateway answered with status {response.status_code}"
+                )
+            data = response.json()
+            outcome = "success"
+            return data
+        except requests.Timeout as e:
+            outcome = "timeout"
+            error = GatewayNotReached if is_connect_error(e) else GatewayError
+            raise error(f"Payment gateway request timed out: {e}") from e
+        except (requests.RequestException, ValueError) as e:
+            error = GatewayNotReached if is_connect_error(e) else GatewayError
+            raise error(f"Payment gateway request failed: {e}") from e
+        finally:
+            elapsed = time.monotonic() - started
+            self.breaker.after_call(outcome == "success", elapsed)
+            # One batch of counter updates per call
+            metrics.increment_many(
+                {
+                    f"{METRIC_PREFIX}:{outcome}": 1,
+                    **metrics.histogram_deltas(
+                        f"{METRIC_PREFIX}:latency", elapsed, LATENCY_BUCKETS
+                    ),
+                }
+            )
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_gateway_client():
+    """
+    Return the process wide gateway client, creating it from settings on first use
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AamarPayClient(
+                    settings.URL,
+                    connect_timeout=settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT,
+                    read_timeout=settings.PAYMENT_GATEWAY_READ_TIMEOUT,
+                    max_retries=settings.PAYMENT_GATEWAY_MAX_RETRIES,
+                    backoff_factor=settings.PAYMENT_GATEWAY_BACKOFF_FACTOR,
+                    pool_size=settings.PAYMENT_GATEWAY_POOL_SIZE,
+                    breaker=CircuitBreaker(
+                        failure_rate=settings.PAYMENT_GATEWAY_BREAKER_FAILURE_RATE,
+                        window=settings.PAYMENT_GATEWAY_BREAKER_WINDOW,
+                        min_calls=settings.PAYMENT_GATEWAY_BREAKER_MIN_CALLS,
+                        slow_call_seconds=settings.PAYMENT_GATEWAY_BREAKER_SLOW_CALL,
+                        reset_timeout=settings.PAYMENT_GATEWAY_BREAKER_RESET_TIMEOUT,
+                    ),
+                )
+
+    return _client
+
+
+def get_gateway_stats():
+    """
+    Return the circuit breaker state, outcome counters and latency histogram
+    """
+    counters = metrics.get_counters([f"{METRIC_PREFIX}:{name}" for name in OUTCOMES])
+
+    return {
+        "circuit_breaker": get_gateway_client().breaker.state,
+        "outcomes": {name: counters[f"{METRIC_PREFIX}:{name}"] for name in OUTCOMES},
+        "latency": metrics.get_histogram(f"{METRIC_PREFIX}:latency", LATENCY_BUCKETS),
+    }
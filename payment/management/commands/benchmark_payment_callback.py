@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+
+from payment.models import PaymentTransaction
+from payment.views import PaymentSuccessAPIView
+from user.models import CustomUser
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark payment success callback latency as the transactions table grows. "
+        "Everything created is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[10000, 100000, 1000000],
+            help="Transaction table sizes to measure at",
+        )
+        parser.add_argument(
+            "--callbacks", type=int, default=200, help="Callbacks timed per size"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]):
+            self.run(sorted(options["sizes"]), options["callbacks"])
+            transaction.set_rollback(True)
+
+    def run(self, sizes, callbacks):
+        user = CustomUser.objects.create_user(
+            username=f"benchmark_{uuid.uuid4().hex[:8]}",
+            password=None,
+            email="benchmark@example.com",
+            mobile_number="0",
+        )
+        view = PaymentSuccessAPIView.as_view()
+        factory = APIRequestFactory()
+        transaction_ids = []
+
+        for size in sizes:
+            self.create_transactions(user, size - len(transaction_ids), transaction_ids)
+
+            timings = []
+            queries = 0
+            for trans_id in random.sample(transaction_ids, callbacks):
+                request = factory.post(
+                    "/api/payment/success/",
+                    {"mer_txnid": trans_id, "pay_status": "Successful"},
+                    format="json",
+                )
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    view(request)
+                    timings.append(time.perf_counter() - started)
+                queries += len(captured)
+
+            timings.sort()
+            self.stdout.write(
+                f"rows={len(transaction_ids)} "
+                f"median={statistics.median(timings) * 1000:.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95) - 1] * 1000:.2f}ms "
+                f"queries/callback={queries / callbacks:.1f}"
+            )
+
+    def create_transactions(self, user, count, transaction_ids):
+        for offset in range(0, max(count, 0), BATCH_SIZE):
+            batch = [
+                f"PAY_{uuid.uuid4().hex[:16]}"
+                for _ in range(min(BATCH_SIZE, count - offset))
+            ]
+            PaymentTransaction.objects.bulk_create(
+                [
+                    PaymentTransaction(user=user, transaction_id=trans_id)
+                    for trans_id in batch
+                ]
+            )
+            transaction_ids.extend(batch)
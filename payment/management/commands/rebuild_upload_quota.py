@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from payment.quota import rebuild_upload_quotas
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's upload credits from payment and upload history"
+
+    def handle(self, *args, **options):
+        users = rebuild_upload_quotas()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt upload quota of {users} users"))
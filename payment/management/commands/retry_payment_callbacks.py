@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from payment.models import PaymentCallbackInbox
+from payment.tasks import process_payment_callbacks
+
+
+class Command(BaseCommand):
+    help = (
+        "Give inbox callbacks that failed PAYMENT_CALLBACK_MAX_ATTEMPTS times "
+        "another round of attempts, then apply the inbox"
+    )
+
+    def handle(self, *args, **options):
+        reset = PaymentCallbackInbox.objects.filter(
+            processed_at__isnull=True, attempts__gt=0
+        ).update(attempts=0)
+        processed = process_payment_callbacks()
+        self.stdout.write(
+            self.style.SUCCESS(f"Retried {reset} failed callbacks, took {processed}")
+        )
@@ -0,0 +1,82 @@
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """
+    Answer aamarPay JSON payment requests with a fake payment url
+    """
+
+    protocol_version = "HTTP/1.1"
+    delay = 0
+    failure_rate = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        time.sleep(self.delay)
+
+        if random.random() < self.failure_rate:
+            self.send_json(503, {"result": "false", "detail": "Service unavailable"})
+            return
+
+        self.send_json(
+            200,
+            {
+                "result": "true",
+                "payment_url": f"http://{self.headers.get('Host')}/paynow/"
+                f"{payload.get('tran_id', uuid.uuid4().hex)}",
+            },
+        )
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Run a local stub of the aamarPay gateway to test the payment client against"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--delay", type=float, default=0, help="Seconds to wait before answering"
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0,
+            help="Share of requests answered with 503",
+        )
+
+    def handle(self, *args, **options):
+        StubGatewayHandler.delay = options["delay"]
+        StubGatewayHandler.failure_rate = options["failure_rate"]
+
+        server = ThreadingHTTPServer(
+            (options["host"], options["port"]), StubGatewayHandler
+        )
+        self.stdout.write(
+            f"Stub gateway listening on http://{options['host']}:{options['port']}/ "
+            f"(set URL to it to use it)"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
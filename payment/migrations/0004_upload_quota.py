@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_upload_quotas(apps, schema_editor):
+    """
+    Give every user the credits of their paid payments minus their uploads.
+    Uses only historical models, so later changes to payment.quota can not break it.
+    """
+    UploadQuota = apps.get_model('payment', 'UploadQuota')
+    PaymentTransaction = apps.get_model('payment', 'PaymentTransaction')
+    FileUpload = apps.get_model('fileprocessing', 'FileUpload')
+
+    credits = {
+        row['user']: row['total']
+        for row in PaymentTransaction.objects.filter(status='Paid').values('user').annotate(total=Count('pk'))
+    }
+    for row in FileUpload.objects.values('user').annotate(total=Count('pk')):
+        credits[row['user']] = credits.get(row['user'], 0) - row['total']
+
+    UploadQuota.objects.bulk_create(
+        [UploadQuota(user_id=user_id, credits=max(total, 0)) for user_id, total in credits.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fileprocessing', '0003_word_count_cache'),
+        ('payment', '0003_alter_paymenttransaction_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadQuota',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='upload_quota', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('credits', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_upload_quotas, migrations.RunPython.noop),
+    ]
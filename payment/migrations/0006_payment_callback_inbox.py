@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0005_unique_transaction_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallbackInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('success', 'Success'), ('failure', 'Failure')], max_length=10)),
+                ('transaction_id', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='callback_inbox_pending_idx')],
+            },
+        ),
+    ]
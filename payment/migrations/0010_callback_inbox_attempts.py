@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0009_listing_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentcallbackinbox',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paymentcallbackinbox',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from user.models import CustomUser
-from .choices import StatusChoice
+from .choices import CallbackKindChoice, StatusChoice
 import uuid
 
 class PaymentTransaction(models.Model):
@@ -8,10 +8,40 @@ class PaymentTransaction(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="paymentTransactions")
     amount = models.DecimalField(max_digits=10, decimal_places=2, default=100.00)
     status = models.CharField(max_length=15, choices=StatusChoice.choices, default=StatusChoice.PENDING)
-    transaction_id = models.CharField(max_length=100, blank=True, null=True)
+    transaction_id = models.CharField(max_length=100, blank=True, null=True, unique=True)
     gateway_response = models.JSONField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'payment_id'], name='payment_keyset_idx'),
+            models.Index(fields=['user', 'timestamp', 'payment_id'], name='payment_user_keyset_idx'),
+            models.Index(fields=['status', 'timestamp', 'payment_id'], name='payment_status_idx'),
+        ]
 
     def __str__(self):
         return f"Payment_id is {self.payment_id}, user is {self.user.username}"
 
+class UploadQuota(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name="upload_quota")
+    credits = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"user is {self.user.username}, credits left {self.credits}"
+
+class PaymentCallbackInbox(models.Model):
+    kind = models.CharField(max_length=10, choices=CallbackKindChoice.choices)
+    transaction_id = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'id'], name='callback_inbox_pending_idx')]
+
+    def __str__(self):
+        return f"{self.kind} callback for {self.transaction_id}"
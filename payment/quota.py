@@ -0,0 +1,80 @@
+import logging
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .choices import StatusChoice
+from .models import UploadQuota
+
+logger = logging.getLogger(__name__)
+
+
+def add_upload_credits(user, credits=1):
+    """
+    Atomically give a user more upload credits, creating their quota row if needed
+    """
+    if UploadQuota.objects.filter(user=user).update(credits=F("credits") + credits):
+        return
+
+    try:
+        with transaction.atomic():
+            UploadQuota.objects.create(user=user, credits=credits)
+    except IntegrityError:
+        # Created concurrently by another request, increment that row instead
+        UploadQuota.objects.filter(user=user).update(credits=F("credits") + credits)
+
+
+def consume_upload_credits(user, credits=1):
+    """
+    Atomically take upload credits from a user.
+    Returns False, without changing anything, when the user has too few left.
+    """
+    return bool(
+        UploadQuota.objects.filter(user=user, credits__gte=credits).update(
+            credits=F("credits") - credits
+        )
+    )
+
+
+def get_upload_credits(user, lock=False):
+    """
+    Return the upload credits a user has left, without taking any. With `lock` the
+    quota row stays locked until the transaction ends.
+    """
+    quota = UploadQuota.objects.filter(user=user)
+    if lock:
+        quota = quota.select_for_update()
+    return quota.values_list("credits", flat=True).first() or 0
+
+
+def rebuild_upload_quotas():
+    """
+    Recompute every user's upload credits from payment and upload history
+    """
+    # Looked up by name, fileprocessing imports this module
+    payment_model = apps.get_model("payment", "PaymentTransaction")
+    file_upload_model = apps.get_model("fileprocessing", "FileUpload")
+
+    credits = {
+        row["user"]: row["total"]
+        for row in payment_model.objects.filter(status=StatusChoice.PAID)
+        .values("user")
+        .annotate(total=Count("pk"))
+    }
+    for row in file_upload_model.objects.values("user").annotate(total=Count("pk")):
+        credits[row["user"]] = credits.get(row["user"], 0) - row["total"]
+
+    with transaction.atomic():
+        UploadQuota.objects.exclude(user__in=list(credits)).update(credits=0)
+        UploadQuota.objects.bulk_create(
+            [
+                UploadQuota(user_id=user_id, credits=max(total, 0))
+                for user_id, total in credits.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["credits"],
+        )
+
+    return len(credits)
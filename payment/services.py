@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.utils import timezone
+
+from utils.logger import ActivityLogger
+
+from .choices import CallbackKindChoice, StatusChoice
+from .models import PaymentTransaction
+from .quota import add_upload_credits
+
+# Payment status logged in the activity log when a callback moves a payment to it
+CALLBACK_ACTIVITY = {StatusChoice.PAID: "Successful", StatusChoice.FAILED: "Failed"}
+
+
+def get_payment(transaction_id):
+    """
+    Resolve a payment with its user in one query on the unique transaction id
+    """
+    return PaymentTransaction.objects.select_related("user").get(
+        transaction_id=transaction_id
+    )
+
+
+# Statuses a payment may move to from each status. Callbacks only move a payment
+# forward, every final status is terminal.
+ALLOWED_TRANSITIONS = {
+    StatusChoice.PENDING: {
+        StatusChoice.PAID,
+        StatusChoice.FAILED,
+        StatusChoice.EXPIRED,
+    },
+    StatusChoice.PAID: set(),
+    StatusChoice.FAILED: set(),
+    StatusChoice.EXPIRED: set(),
+}
+
+
+def can_transition(current_status, new_status):
+    return new_status in ALLOWED_TRANSITIONS.get(current_status, set())
+
+
+def record_gateway_callback(payment, new_status, gateway_response):
+    """
+    Apply the status reported by a gateway callback to a payment.
+
+    Retried and out of order callbacks, which would not move the payment forward,
+    return False before any write. Otherwise the status is stored with an UPDATE
+    conditional on the status read, so concurrent duplicates apply only once, and
+    a payment becoming PAID buys one upload credit. Returns whether it was applied.
+    """
+    current_status = payment.status
+    if not can_transition(current_status, new_status):
+        return False
+
+    with transaction.atomic():
+        updated = bool(
+            PaymentTransaction.objects.filter(
+                pk=payment.pk, status=current_status
+            ).update(
+                status=new_status,
+                gateway_response=gateway_response,
+                updated_at=timezone.now(),
+            )
+        )
+        if updated and new_status == StatusChoice.PAID:
+            add_upload_credits(payment.user)
+
+    if updated:
+        payment.status = new_status
+        payment.gateway_response = gateway_response
+
+    return updated
+
+
+def callback_status(kind, gateway_data):
+    """
+    Map a success or failure callback payload to the payment status it reports
+    """
+    if kind == CallbackKindChoice.FAILURE:
+        return StatusChoice.FAILED
+
+    pay_status = gateway_data.get("pay_status")
+    if pay_status == "Successful":
+        return StatusChoice.PAID
+    elif pay_status == "Expired":
+        return StatusChoice.EXPIRED
+    return StatusChoice.PENDING
+
+
+def apply_gateway_callback(payment, new_status, gateway_data):
+    """
+    Record a callback and log the activity when it moved the payment forward
+    """
+    applied = record_gateway_callback(payment, new_status, gateway_data)
+    if applied and new_status in CALLBACK_ACTIVITY:
+        ActivityLogger.log_payment_info(
+            payment.user, payment.transaction_id, CALLBACK_ACTIVITY[new_status]
+        )
+
+    return applied
@@ -0,0 +1,84 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PaymentCallbackInbox, PaymentTransaction
+from .services import apply_gateway_callback, callback_status
+
+logger = logging.getLogger(__name__)
+
+
+def process_callback_batch(batch_size, after_id=0):
+    """
+    Apply the oldest pending inbox callbacks after `after_id` in one transaction.
+    Returns how many were taken and the id of the last one.
+
+    Callbacks are applied in arrival order, so retries of a callback already
+    applied are skipped by the payment state machine. A callback that fails, or
+    names an unknown transaction, stays pending with its error and is tried again
+    by a later run, until PAYMENT_CALLBACK_MAX_ATTEMPTS.
+    """
+    with transaction.atomic():
+        entries = list(
+            PaymentCallbackInbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                processed_at__isnull=True,
+                attempts__lt=settings.PAYMENT_CALLBACK_MAX_ATTEMPTS,
+                id__gt=after_id,
+            )
+            .order_by("id")[:batch_size]
+        )
+        if not entries:
+            return 0, after_id
+
+        payments = PaymentTransaction.objects.select_related("user").in_bulk(
+            {entry.transaction_id for entry in entries}, field_name="transaction_id"
+        )
+        processed = []
+        for entry in entries:
+            payment = payments.get(entry.transaction_id)
+            try:
+                if payment is None:
+                    raise ValueError(f"Unknown transaction {entry.transaction_id}")
+                with transaction.atomic():
+                    new_status = callback_status(entry.kind, entry.payload)
+                    apply_gateway_callback(payment, new_status, entry.payload)
+                processed.append(entry.pk)
+            except Exception as e:
+                logger.error(
+                    f"Failed to apply payment callback {entry.pk}=> {e}", exc_info=True
+                )
+                PaymentCallbackInbox.objects.filter(pk=entry.pk).update(
+                    attempts=F("attempts") + 1, last_error=str(e)
+                )
+
+        PaymentCallbackInbox.objects.filter(pk__in=processed).update(
+            processed_at=timezone.now()
+        )
+
+    return len(entries), entries[-1].pk
+
+
+@shared_task
+def process_payment_callbacks():
+    """
+    Celery task draining the payment callback inbox in batches
+    """
+    batch_size = settings.PAYMENT_CALLBACK_BATCH_SIZE
+    processed = last_id = 0
+    try:
+        while True:
+            # Callbacks failing in this run are retried by the next one
+            taken, last_id = process_callback_batch(batch_size, last_id)
+            processed += taken
+            if taken < batch_size:
+                break
+
+        return processed
+    except Exception as e:
+        logger.error(f"Error in process_payment_callbacks: {str(e)}", exc_info=True)
+        return "Error"
@@ -1,3 +1,344 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from rest_framework.test import APIClient
+
+from dashboard.choices import PeriodChoice
+from dashboard.models import PaymentRollup
+from dashboard.rollups import update_rollups
+from fileprocessing.models import ActivityLog, FileUpload
+from fileprocessing.serializers import FileUploadSerializer
+from user.models import CustomUser
+
+from .choices import CallbackKindChoice, StatusChoice
+from .gateway import GatewayError, GatewayNotReached
+from .models import PaymentCallbackInbox, PaymentTransaction
+from .quota import add_upload_credits, consume_upload_credits, get_upload_credits
+from .services import (
+    ALLOWED_TRANSITIONS,
+    apply_gateway_callback,
+    callback_status,
+    can_transition,
+    record_gateway_callback,
+)
+from .tasks import process_payment_callbacks
+from .views import InitiatePayment
+
+
+def create_user(username="payer"):
+    return CustomUser.objects.create_user(
+        username=username,
+        password="password",
+        email=f"{username}@example.com",
+        mobile_number="01700000000",
+    )
+
+
+class GatewayCallbackStateMachineTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.payment = PaymentTransaction.objects.create(
+            user=self.user, transaction_id="PAY_TEST"
+        )
+
+    def reload(self):
+        return PaymentTransaction.objects.get(pk=self.payment.pk)
+
+    def test_only_pending_payments_can_move(self):
+        for status in StatusChoice.values:
+            self.assertIn(status, ALLOWED_TRANSITIONS)
+
+        self.assertEqual(
+            ALLOWED_TRANSITIONS[StatusChoice.PENDING],
+            {StatusChoice.PAID, StatusChoice.FAILED, StatusChoice.EXPIRED},
+        )
+        for final in (StatusChoice.PAID, StatusChoice.FAILED, StatusChoice.EXPIRED):
+            for status in StatusChoice.values:
+                self.assertFalse(can_transition(final, status))
+        self.assertFalse(can_transition(StatusChoice.PENDING, StatusChoice.PENDING))
+
+    def test_paid_callback_applies_once(self):
+        self.assertTrue(
+            record_gateway_callback(self.payment, StatusChoice.PAID, {"try": 1})
+        )
+        self.assertFalse(
+            record_gateway_callback(self.payment, StatusChoice.PAID, {"try": 2})
+        )
+
+        payment = self.reload()
+        self.assertEqual(payment.status, StatusChoice.PAID)
+        self.assertEqual(payment.gateway_response, {"try": 1})
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+    def test_concurrent_duplicate_applies_once(self):
+        # Both callbacks read the payment while it was still pending
+        first = self.reload()
+        second = self.reload()
+
+        self.assertTrue(record_gateway_callback(first, StatusChoice.PAID, {"n": 1}))
+        self.assertFalse(record_gateway_callback(second, StatusChoice.PAID, {"n": 2}))
+
+        self.assertEqual(second.status, StatusChoice.PENDING)
+        self.assertEqual(self.reload().gateway_response, {"n": 1})
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+    def test_late_failure_does_not_undo_payment(self):
+        record_gateway_callback(self.payment, StatusChoice.PAID, {})
+
+        self.assertFalse(record_gateway_callback(self.payment, StatusChoice.FAILED, {}))
+        self.assertEqual(self.reload().status, StatusChoice.PAID)
+
+    def test_failed_callback_buys_no_credit(self):
+        self.assertTrue(record_gateway_callback(self.payment, StatusChoice.FAILED, {}))
+
+        self.assertEqual(self.reload().status, StatusChoice.FAILED)
+        self.assertEqual(get_upload_credits(self.user), 0)
+
+    def test_activity_logged_only_when_applied(self):
+        apply_gateway_callback(self.payment, StatusChoice.PAID, {})
+        apply_gateway_callback(self.reload(), StatusChoice.PAID, {})
+
+        self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 1)
+
+    def test_callback_status(self):
+        self.assertEqual(
+            callback_status(CallbackKindChoice.SUCCESS, {"pay_status": "Successful"}),
+            StatusChoice.PAID,
+        )
+        self.assertEqual(
+            callback_status(CallbackKindChoice.SUCCESS, {"pay_status": "Expired"}),
+            StatusChoice.EXPIRED,
+        )
+        self.assertEqual(
+            callback_status(CallbackKindChoice.SUCCESS, {}), StatusChoice.PENDING
+        )
+        self.assertEqual(
+            callback_status(CallbackKindChoice.FAILURE, {"pay_status": "Successful"}),
+            StatusChoice.FAILED,
+        )
+
+
+@override_settings(PAYMENT_CALLBACK_ASYNC=True, PAYMENT_CALLBACK_MAX_ATTEMPTS=2)
+class PaymentCallbackInboxTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.payment = PaymentTransaction.objects.create(
+            user=self.user, transaction_id="PAY_INBOX"
+        )
+        delay = mock.patch("payment.views.process_payment_callbacks.delay")
+        self.delay = delay.start()
+        self.addCleanup(delay.stop)
+
+    def callback(self, transaction_id="PAY_INBOX"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                "/api/payment/success/",
+                {"mer_txnid": transaction_id, "pay_status": "Successful"},
+            )
+
+    def test_callback_is_acknowledged_and_applied_by_the_task(self):
+        response = self.callback()
+
+        self.assertEqual(response.status_code, 202)
+        self.delay.assert_called_once()
+        self.assertEqual(process_payment_callbacks(), 1)
+        self.assertEqual(PaymentTransaction.objects.get().status, StatusChoice.PAID)
+        self.assertIsNotNone(PaymentCallbackInbox.objects.get().processed_at)
+
+    def test_broker_down_still_acknowledges(self):
+        self.delay.side_effect = ConnectionError("broker down")
+
+        with self.assertLogs("payment.views", "ERROR"):
+            response = self.callback()
+
+        self.assertEqual(response.status_code, 202)
+        # Left for the beat sweep
+        self.assertIsNone(PaymentCallbackInbox.objects.get().processed_at)
+
+    def test_retries_apply_once(self):
+        self.callback()
+        self.callback()
+
+        self.assertEqual(process_payment_callbacks(), 2)
+        self.assertEqual(get_upload_credits(self.user), 1)
+        self.assertFalse(
+            PaymentCallbackInbox.objects.filter(processed_at__isnull=True).exists()
+        )
+
+    def test_failing_callback_stops_at_the_attempt_cap(self):
+        self.callback("PAY_UNKNOWN")
+
+        with self.assertLogs("payment.tasks", "ERROR"):
+            for _ in range(2):
+                self.assertEqual(process_payment_callbacks(), 1)
+        self.assertEqual(process_payment_callbacks(), 0)
+
+        entry = PaymentCallbackInbox.objects.get()
+        self.assertEqual(entry.attempts, 2)
+        self.assertIsNone(entry.processed_at)
+        self.assertIn("PAY_UNKNOWN", entry.last_error)
+
+
+class InitiatePaymentTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def initiate(self, error):
+        gateway = mock.Mock()
+        gateway.initiate_payment.side_effect = error
+        with mock.patch("payment.views.get_gateway_client", return_value=gateway):
+            with self.assertLogs("payment.views", "ERROR"):
+                return self.client.post("/api/initiate-payment/")
+
+    def test_payment_the_gateway_never_got_fails(self):
+        response = self.initiate(GatewayNotReached("connection refused"))
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(PaymentTransaction.objects.get().status, StatusChoice.FAILED)
+
+    def test_payment_the_gateway_may_have_got_stays_pending(self):
+        response = self.initiate(GatewayError("read timeout"))
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(PaymentTransaction.objects.get().status, StatusChoice.PENDING)
+
+    @override_settings(ROLLUP_WATERMARK_OVERLAP=0)
+    def test_failed_payment_reaches_the_rollups(self):
+        payment = PaymentTransaction.objects.create(
+            user=self.user, transaction_id="PAY_LOST"
+        )
+        update_rollups()
+
+        InitiatePayment().fail_payment(payment)
+        update_rollups()
+
+        self.assertEqual(
+            sorted(PaymentRollup.objects.values_list("period", "status", "count")),
+            [
+                (PeriodChoice.DAY, StatusChoice.FAILED, 1),
+                (PeriodChoice.HOUR, StatusChoice.FAILED, 1),
+            ],
+        )
+
+
+class UploadQuotaTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        add_upload_credits(self.user, 2)
+
+    def test_credits_never_go_below_zero(self):
+        taken = [consume_upload_credits(self.user) for _ in range(3)]
+
+        self.assertEqual(taken, [True, True, False])
+        self.assertEqual(get_upload_credits(self.user), 0)
+
+    def test_batch_reservation_is_all_or_nothing(self):
+        self.assertFalse(consume_upload_credits(self.user, 3))
+        self.assertEqual(get_upload_credits(self.user), 2)
+
+    def test_stale_reads_can_not_overspend(self):
+        consume_upload_credits(self.user)
+        # Two uploads both saw the last credit before either took it
+        self.assertEqual(get_upload_credits(self.user), 1)
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+        self.assertTrue(consume_upload_credits(self.user))
+        self.assertFalse(consume_upload_credits(self.user))
+        self.assertEqual(get_upload_credits(self.user), 0)
+
+
+class UploadQuotaViewTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name="notes.txt"):
+        return self.client.post(
+            "/api/upload/",
+            {"file": SimpleUploadedFile(name, b"counted words here")},
+            format="multipart",
+        )
+
+    def test_upload_takes_one_credit(self):
+        add_upload_credits(self.user, 2)
+
+        self.assertEqual(self.upload().status_code, 201)
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+    def test_upload_without_credit_is_refused(self):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(FileUpload.objects.exists())
+
+    def test_failed_save_releases_the_credit(self):
+        add_upload_credits(self.user, 1)
+
+        with mock.patch.object(
+            FileUploadSerializer, "save", side_effect=OSError("disk full")
+        ):
+            response = self.upload()
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+    def test_batch_needs_a_credit_per_file(self):
+        add_upload_credits(self.user, 1)
+
+        response = self.client.post(
+            "/api/upload/batch/",
+            {
+                "files": [
+                    SimpleUploadedFile("a.txt", b"one"),
+                    SimpleUploadedFile("b.txt", b"two"),
+                ]
+            },
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(get_upload_credits(self.user), 1)
+
+
+class ConcurrentUploadQuotaTests(TransactionTestCase):
+    @skipUnlessDBFeature("test_db_allows_multiple_connections")
+    def test_concurrent_reservations_take_each_credit_once(self):
+        user = create_user()
+        add_upload_credits(user, 3)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def reserve():
+            try:
+                barrier.wait()
+                results.append(consume_upload_credits(user))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(get_upload_credits(user), 0)
@@ -1,21 +1,31 @@
-import json
 import logging
 import uuid
 
-import requests
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from user.models import CustomUser
-from utils.logger import ActivityLogger
-
-from .choices import StatusChoice
-from .models import PaymentTransaction
+from utils.filters import ListingFilter
+from utils.listing import FastListMixin
+from utils.pagination import KeysetPagination
+
+from .choices import CallbackKindChoice, StatusChoice
+from .gateway import (
+    GatewayError,
+    GatewayNotReached,
+    GatewayUnavailable,
+    get_gateway_client,
+    get_gateway_stats,
+)
+from .models import PaymentCallbackInbox, PaymentTransaction
 from .serializers import PaymentTransactionSerializer
+from .services import apply_gateway_callback, callback_status, get_payment
+from .tasks import process_payment_callbacks
 
 logger = logging.getLogger(__name__)
 
@@ -36,45 +46,79 @@ class InitiatePayment(APIView):
 
     permission_classes = [IsAuthenticated]
 
-    def get_url_payload_header(self, request, transaction_id, base_url):
+    def get_payload(self, request, transaction_id, base_url):
         """
-        Prepare for payment gateway request URL, payloads and headers
+        Prepare the payment gateway request payload
         """
-        url = settings.URL
-        payload = json.dumps(
-            {
-                "store_id": settings.STORE_ID,
-                "tran_id": transaction_id,
-                "success_url": f"{base_url}/api/payment/success/",
-                "fail_url": f"{base_url}/api/payment/failure/",
-                "cancel_url": f"{base_url}/api/payment/cancel/",
-                "amount": "100.0",
-                "currency": "BDT",
-                "signature_key": settings.SIGNATURE_KEY,
-                "desc": "Merchant Registration Payment",
-                "cus_name": request.user.username,
-                "cus_email": request.user.email,
-                "cus_phone": request.user.mobile_number,
-                "type": "json",
-            }
+        return {
+            "store_id": settings.STORE_ID,
+            "tran_id": transaction_id,
+            "success_url": f"{base_url}/api/payment/success/",
+            "fail_url": f"{base_url}/api/payment/failure/",
+            "cancel_url": f"{base_url}/api/payment/cancel/",
+            "amount": "100.0",
+            "currency": "BDT",
+            "signature_key": settings.SIGNATURE_KEY,
+            "desc": "Merchant Registration Payment",
+            "cus_name": request.user.username,
+            "cus_email": request.user.email,
+            "cus_phone": request.user.mobile_number,
+            "type": "json",
+        }
+
+    def gateway_unavailable(self):
+        return Response(
+            {"detail": "Payment gateway is temporarily unavailable, please try later"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={
+                "Retry-After": str(
+                    round(settings.PAYMENT_GATEWAY_BREAKER_RESET_TIMEOUT)
+                )
+            },
         )
-        headers = {"Content-Type": "application/json"}
 
-        return url, payload, headers
+    def fail_payment(self, payment):
+        """
+        Mark a payment the gateway never received as failed instead of leaving it pending
+        """
+        if payment is not None:
+            PaymentTransaction.objects.filter(
+                pk=payment.pk, status=StatusChoice.PENDING
+            ).update(status=StatusChoice.FAILED, updated_at=timezone.now())
 
     def post(self, request):
+        payment = None
         try:
+            gateway = get_gateway_client()
+            if not gateway.is_available():
+                return self.gateway_unavailable()
+
             user = request.user
             transaction_id = f"PAY_{uuid.uuid4().hex[:16]}"
-            PaymentTransaction.objects.create(user=user, transaction_id=transaction_id)
+            payment = PaymentTransaction.objects.create(
+                user=user, transaction_id=transaction_id
+            )
 
             base_url = get_base_url(request)
-            url, payload, headers = self.get_url_payload_header(
-                request, transaction_id, base_url
+            payload = self.get_payload(request, transaction_id, base_url)
+            response_data = gateway.initiate_payment(payload)
+
+            return Response(response_data)
+        except GatewayUnavailable:
+            self.fail_payment(payment)
+            return self.gateway_unavailable()
+        except GatewayError as e:
+            # A payment the gateway may have received stays pending for its callback
+            if isinstance(e, GatewayNotReached):
+                self.fail_payment(payment)
+            logger.error(
+                f"Payment gateway error for user {request.user.id}=> {e}",
+                exc_info=True,
+            )
+            return Response(
+                {"detail": "Payment gateway is unavailable, please try again"},
+                status=status.HTTP_502_BAD_GATEWAY,
             )
-            response = requests.request("POST", url, headers=headers, data=payload)
-
-            return Response(response.json())
         except Exception as e:
             logger.error(
                 f"Error initiating payment for user {request.user.id}=> {e}",
@@ -86,47 +130,69 @@ class InitiatePayment(APIView):
             )
 
 
+def trigger_callback_processing():
+    """
+    Queue the inbox task. A broker failure is only logged: the callback is already
+    stored and the beat sweep applies it.
+    """
+    try:
+        process_payment_callbacks.delay()
+    except Exception as e:
+        logger.error(f"Error queueing payment callback processing=> {e}", exc_info=True)
+
+
+def queue_callback(kind, trans_id, gateway_data):
+    """
+    Store a gateway callback in the inbox and acknowledge it right away.
+    The inbox is processed in batches by a celery task.
+    """
+    PaymentCallbackInbox.objects.create(
+        kind=kind, transaction_id=trans_id, payload=gateway_data
+    )
+    transaction.on_commit(trigger_callback_processing)
+
+    return Response(
+        {"message": "Payment callback received", "transaction_id": trans_id},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
 class PaymentSuccessAPIView(APIView):
     """
     API view to handle successful payment callback from aamarPay payment gateway
     """
 
+    kind = CallbackKindChoice.SUCCESS
+
     def post(self, request):
         try:
             gateway_data = request.data
             trans_id = gateway_data.get("mer_txnid")
             pay_status = gateway_data.get("pay_status")
-            user_name = gateway_data.get("cus_name")
 
-            if not all([gateway_data, trans_id, pay_status, user_name]):
+            if not all([gateway_data, trans_id, pay_status]):
                 return Response(
                     {"detail": "Missing required parameters"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            user = CustomUser.objects.get(username=user_name)
+
+            if settings.PAYMENT_CALLBACK_ASYNC:
+                return queue_callback(self.kind, trans_id, gateway_data)
 
             try:
-                payment = PaymentTransaction.objects.get(transaction_id=trans_id)
+                payment = get_payment(trans_id)
             except PaymentTransaction.DoesNotExist:
                 return Response(
                     {"detail": "Payment Transaction id is not found"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            payment.gateway_response = gateway_data
-
-            if pay_status == "Successful":
-                payment.status = StatusChoice.PAID
-            elif pay_status == "Expired":
-                payment.status = StatusChoice.EXPIRED
-            else:
-                payment.status = StatusChoice.PENDING
+            new_status = callback_status(CallbackKindChoice.SUCCESS, gateway_data)
+            apply_gateway_callback(payment, new_status, gateway_data)
 
-            payment.save(update_fields=["status", "gateway_response"])
             base_url = get_base_url(request)
 
-            if pay_status == "Successful":
-                ActivityLogger.log_payment_info(user, trans_id, pay_status)
+            if payment.status == StatusChoice.PAID:
                 return Response(
                     {
                         "message": "Payment Successful",
@@ -135,6 +201,9 @@ class PaymentSuccessAPIView(APIView):
                     }
                 )
             else:
+                # A late callback does not change a payment that already finished
+                if payment.status != new_status:
+                    pay_status = payment.status
                 return Response(
                     {
                         "message": f"Payment is {pay_status}",
@@ -154,33 +223,31 @@ class PaymentFailureAPIView(APIView):
     API view to handle failed payment callback from aamarPay payment gateway
     """
 
+    kind = CallbackKindChoice.FAILURE
+
     def post(self, request):
         try:
             gateway_data = request.data
             trans_id = gateway_data.get("mer_txnid")
-            user_name = gateway_data.get("cus_name")
 
-            if not all([gateway_data, trans_id, user_name]):
+            if not all([gateway_data, trans_id]):
                 return Response(
                     {"detail": "Missing required parameters"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            user = CustomUser.objects.get(username=user_name)
+            if settings.PAYMENT_CALLBACK_ASYNC:
+                return queue_callback(self.kind, trans_id, gateway_data)
 
             try:
-                payment = PaymentTransaction.objects.get(transaction_id=trans_id)
+                payment = get_payment(trans_id)
             except PaymentTransaction.DoesNotExist:
                 return Response(
                     {"detail": "Payment Transaction id is not found"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            payment.gateway_response = gateway_data
-            payment.status = StatusChoice.FAILED
-
-            payment.save(update_fields=["status", "gateway_response"])
-            ActivityLogger.log_payment_info(user, trans_id, "Failed")
+            apply_gateway_callback(payment, StatusChoice.FAILED, gateway_data)
 
             return Response(
                 {
@@ -203,11 +270,36 @@ def payment_cancel(request):
     return Response({"detail": "Payment was canceled by user", "status": "cancelled"})
 
 
-class TransctionsListView(generics.ListAPIView):
+class TransctionsListView(FastListMixin, generics.ListAPIView):
     """
     API view to list all payment transactions(Admin Only)
+    Filter with `status`, `start`/`end` and `user`.
+    `gateway_response` is only included with `expand=gateway_response`
     """
 
     queryset = PaymentTransaction.objects.select_related("user").order_by("-timestamp")
     serializer_class = PaymentTransactionSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    keyset_field = "timestamp"
+    filter_backends = [ListingFilter]
+    filter_fields = {"status": StatusChoice.values}
+    heavy_fields = ["gateway_response"]
+
+
+class PaymentGatewayStatsView(APIView):
+    """
+    API view to monitor payment gateway health and latency(Admin Only)
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            return Response(get_gateway_stats())
+        except Exception as e:
+            logger.error(f"Error fetching payment gateway stats=> {e}", exc_info=True)
+            return Response(
+                {"detail": "Server Error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is refused because the circuit breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    In-process circuit breaker guarding calls to an unreliable dependency.
+
+    The outcome of the last `window` calls is kept, a call slower than
+    `slow_call_seconds` counting as a failure. Once at least `min_calls` were made
+    and the failure rate reaches `failure_rate`, the breaker opens and refuses calls
+    for `reset_timeout` seconds. It then lets a single trial call through
+    (half open): success closes the breaker, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate=0.5,
+        window=20,
+        min_calls=10,
+        slow_call_seconds=5,
+        reset_timeout=30,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._reset_timeout_elapsed():
+                return self.HALF_OPEN
+            return self._state
+
+    def _reset_timeout_elapsed(self):
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def is_available(self):
+        """
+        Check without side effects whether a call would currently be let through
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            return not self._trial_running and self._reset_timeout_elapsed()
+
+    def before_call(self):
+        """
+        Reserve the right to make a call, raising CircuitOpenError when refused
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._trial_running or not self._reset_timeout_elapsed():
+                raise CircuitOpenError("Circuit breaker is open")
+
+            self._state = self.HALF_OPEN
+            self._trial_running = True
+
+    def after_call(self, succeeded, elapsed):
+        """
+        Record the outcome of a call made after before_call
+        """
+        failed = not succeeded or elapsed >= self.slow_call_seconds
+
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_running = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = self.CLOSED
+                return
+
+            self._outcomes.append(failed)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
@@ -0,0 +1,38 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse_query_datetime(value, end=False):
+    """
+    Parse an ISO date or datetime query parameter into an aware datetime.
+    A plain date means the start of that day, or the start of the next day for
+    the end of a range, so ranges include the whole end date.
+    Raises ValueError for invalid values.
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date {value}, use YYYY-MM-DD or ISO 8601")
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+
+    return parsed
+
+
+def parse_date_range(params, start_param="start", end_param="end"):
+    """
+    Return the (start, end) datetimes of a [start, end) query parameter range,
+    None for a bound that is not given
+    """
+    start = params.get(start_param)
+    end = params.get(end_param)
+
+    return (
+        parse_query_datetime(start) if start else None,
+        parse_query_datetime(end, end=True) if end else None,
+    )
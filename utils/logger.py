@@ -1,20 +1,95 @@
+import atexit
 import logging
+import threading
+import time
+
+from django.conf import settings
 
 from fileprocessing.models import ActivityLog
 
 logger = logging.getLogger(__name__)
 
 
+class ActivityLogBuffer:
+    """
+    In-process queue of activity log entries written together with one bulk_create,
+    once `max_size` entries are queued or the oldest one waited `max_age` seconds
+    """
+
+    def __init__(self, max_size=100, max_age=5):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._entries = []
+        self._first_queued_at = None
+        self._lock = threading.Lock()
+
+    def add(self, entries):
+        with self._lock:
+            if not self._entries:
+                self._first_queued_at = time.monotonic()
+            self._entries.extend(entries)
+
+            due = (
+                len(self._entries) >= self.max_size
+                or time.monotonic() - self._first_queued_at >= self.max_age
+            )
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            entries, self._entries = self._entries, []
+
+        if not entries:
+            return
+        try:
+            ActivityLog.objects.bulk_create(entries, batch_size=self.max_size)
+        except Exception as e:
+            logger.error(
+                f"Failed to flush {len(entries)} activity logs=> {e}", exc_info=True
+            )
+
+
+activity_log_buffer = ActivityLogBuffer(
+    settings.ACTIVITY_LOG_BUFFER_SIZE, settings.ACTIVITY_LOG_BUFFER_MAX_AGE
+)
+atexit.register(activity_log_buffer.flush)
+
+
+def flush_activity_logs(**kwargs):
+    """
+    Write every buffered activity log entry, usable as a signal receiver
+    """
+    activity_log_buffer.flush()
+
+
 class ActivityLogger:
     """
-    Utility class for logging user activites into Activitylog Model
+    Utility class for logging user activites into Activitylog Model.
+    With the buffered backend entries are queued and written in batches.
     """
 
+    @staticmethod
+    def _save(entries):
+        if settings.ACTIVITY_LOG_BACKEND == "buffered":
+            activity_log_buffer.add(entries)
+        elif len(entries) == 1:
+            entries[0].save(force_insert=True)
+        else:
+            ActivityLog.objects.bulk_create(entries)
+
     @staticmethod
     def log_file_upload(user, filename):
         try:
-            ActivityLog.objects.create(
-                user=user, action="file_uploaded", metadata={"filename": filename}
+            ActivityLogger._save(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="file_uploaded",
+                        metadata={"filename": filename},
+                    )
+                ]
             )
         except Exception as e:
             logger.error(f"Failed to log file upload=> {e}", exc_info=True)
@@ -22,14 +97,18 @@ class ActivityLogger:
     @staticmethod
     def log_payment_info(user, tranasction_id, payment_status):
         try:
-            ActivityLog.objects.create(
-                user=user,
-                action="payment",
-                metadata={
-                    "tranasction_id": tranasction_id,
-                    "payment_status": payment_status,
-                    "amount": 100.00,
-                },
+            ActivityLogger._save(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="payment",
+                        metadata={
+                            "tranasction_id": tranasction_id,
+                            "payment_status": payment_status,
+                            "amount": 100.00,
+                        },
+                    )
+                ]
             )
         except Exception as e:
             logger.error(f"Failed to log payment info=> {e}", exc_info=True)
@@ -37,14 +116,57 @@ class ActivityLogger:
     @staticmethod
     def log_word_count(user, filename, word_count, status):
         try:
-            ActivityLog.objects.create(
-                user=user,
-                action="word_count",
-                metadata={
-                    "filename": filename,
-                    "word_count": word_count,
-                    "status": status,
-                },
+            ActivityLogger._save(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="word_count",
+                        metadata={
+                            "filename": filename,
+                            "word_count": word_count,
+                            "status": status,
+                        },
+                    )
+                ]
             )
         except Exception as e:
             logger.error(f"Failed to log word count=> {e}", exc_info=True)
+
+    @staticmethod
+    def log_file_uploads(user, filenames):
+        try:
+            ActivityLogger._save(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="file_uploaded",
+                        metadata={"filename": filename},
+                    )
+                    for filename in filenames
+                ]
+            )
+        except Exception as e:
+            logger.error(f"Failed to log file uploads=> {e}", exc_info=True)
+
+    @staticmethod
+    def log_word_counts(user, results):
+        """
+        Log several word count results, given as (filename, word_count, status)
+        """
+        try:
+            ActivityLogger._save(
+                [
+                    ActivityLog(
+                        user=user,
+                        action="word_count",
+                        metadata={
+                            "filename": filename,
+                            "word_count": word_count,
+                            "status": status,
+                        },
+                    )
+                    for filename, word_count, status in results
+                ]
+            )
+        except Exception as e:
+            logger.error(f"Failed to log word counts=> {e}", exc_info=True)
@@ -0,0 +1,72 @@
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "metrics"
+
+
+def increment(name, delta=1):
+    """
+    Increment a monitoring counter kept in the default cache.
+    Counters are shared between processes only when the cache backend is (e.g. Redis).
+    """
+    increment_many({name: delta})
+
+
+def increment_many(deltas):
+    """
+    Increment several counters, given as name: delta, through the public cache API.
+    Counters that already exist cost one incr each.
+    """
+    try:
+        for name, delta in deltas.items():
+            key = f"{KEY_PREFIX}:{name}"
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                # First increment: add never overwrites a counter created meanwhile
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, delta)
+    except Exception as e:
+        logger.error(
+            f"Failed to increment counters {', '.join(deltas)}=> {e}", exc_info=True
+        )
+
+
+def get_counters(names):
+    """
+    Return the current value of each counter, 0 for counters never incremented
+    """
+    values = cache.get_many([f"{KEY_PREFIX}:{name}" for name in names])
+    return {name: values.get(f"{KEY_PREFIX}:{name}", 0) for name in names}
+
+
+def histogram_deltas(name, value, buckets):
+    """
+    Counter increments recording a value in a cumulative histogram, one counter per
+    upper bound in `buckets` plus `inf`, with the observation count and sum in
+    milliseconds
+    """
+    deltas = {f"{name}:le_{bound}": 1 for bound in buckets if value <= bound}
+    deltas[f"{name}:le_inf"] = 1
+    deltas[f"{name}:count"] = 1
+    deltas[f"{name}:sum_ms"] = round(value * 1000)
+    return deltas
+
+
+def get_histogram(name, buckets):
+    """
+    Return the bucket counts, observation count and sum of a histogram
+    """
+    labels = [f"le_{bound}" for bound in buckets] + ["le_inf"]
+    counters = get_counters(
+        [f"{name}:{label}" for label in labels + ["count", "sum_ms"]]
+    )
+
+    return {
+        "buckets": {label: counters[f"{name}:{label}"] for label in labels},
+        "count": counters[f"{name}:count"],
+        "sum_ms": counters[f"{name}:sum_ms"],
+    }
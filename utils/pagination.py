@@ -0,0 +1,121 @@
+import base64
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (time field, primary key), newest first.
+
+    Each page is fetched with a WHERE on the last row of the previous page instead
+    of an OFFSET, so with an index on the two columns every page costs the same.
+    Views name their time field in `keyset_field`. Pages may hold model instances
+    or `values()` rows that include the time field and primary key.
+    """
+
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+
+        return self.page_size
+
+    def setup(self, request, view):
+        self.request = request
+        self.field = view.keyset_field
+        self.pk_field = view.queryset.model._meta.pk
+        self.size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.next_key = None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return datetime.fromisoformat(value), self.pk_field.to_python(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key):
+        value, pk = key
+        data = json.dumps([value.isoformat(), str(pk)])
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_key(self, obj):
+        if isinstance(obj, dict):
+            return obj[self.field], obj[self.pk_field.attname]
+
+        return getattr(obj, self.field), obj.pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.setup(request, view)
+
+        queryset = queryset.order_by(f"-{self.field}", "-pk")
+        if self.cursor is not None:
+            value, pk = self.cursor
+            # The redundant upper bound lets the database seek the index to the cursor
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__lte": value}),
+                Q(**{f"{self.field}__lt": value}) | Q(pk__lt=pk),
+            )
+
+        return self.finish_page(list(queryset[: self.size + 1]))
+
+    def paginate_objects(self, objects, request, view=None):
+        """
+        Paginate objects that are already sorted newest first, e.g. read from files
+        """
+        self.setup(request, view)
+        if self.cursor is not None:
+            objects = (obj for obj in objects if self.get_key(obj) < self.cursor)
+
+        return self.finish_page(list(islice(objects, self.size + 1)))
+
+    def finish_page(self, rows):
+        if len(rows) > self.size:
+            rows = rows[: self.size]
+            self.next_key = self.get_key(rows[-1])
+
+        return rows
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_key)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }